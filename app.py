@@ -1,8 +1,16 @@
 import streamlit as st
-from azure_client import analyze_bytes_document
-from extractors import extract_structured_data
-from document_utils import *
-from result import *
+import metrics
+from config import env
+from jobs import job_store, submit_job, ensure_worker
+from spool import load_json, purge_spool
+from result import (
+    reset_state, display_pdf, get_excel_report, load_job_results, render_search_results,
+    get_summary, filter_documents, paginate,
+    render_cedula_form, render_seguro_form, render_contrato_form, render_generic_form
+)
+
+MAX_FILES_PER_BATCH = int(env("MAX_FILES_PER_BATCH", "500"))
+PAGE_SIZES = [10, 25, 50]
 
 st.set_page_config(page_title="Gestión Documental IA", page_icon="🤖", layout="wide")
 
@@ -37,6 +45,15 @@ if 'processed_data' not in st.session_state:
     st.session_state.processed_data = None
 if 'processing_complete' not in st.session_state:
     st.session_state.processing_complete = False
+if 'job_id' not in st.session_state:
+    # El id del trabajo va en la URL para recuperar los resultados tras un refresco.
+    st.session_state.job_id = st.query_params.get("job")
+
+if job_store.has_pending():
+    ensure_worker()
+
+# Una ejecución completa ya actualiza el resumen; el aviso solo sirve a los fragmentos.
+st.session_state.pop("needs_app_rerun", None)
 
 
 c_logo, c_title = st.columns([0.5, 5])
@@ -50,92 +67,183 @@ col_upload, col_instruct = st.columns([2, 1])
 with col_upload:
     st.subheader("📂 Carga de Documentos")
     uploaded_files = st.file_uploader(
-        "Arrastre aquí sus archivos (PDF). Maximo 4 archivos por lote.",
+        f"Arrastre aquí sus archivos (PDF). Máximo {MAX_FILES_PER_BATCH} archivos por lote.",
         type=["pdf"],
         accept_multiple_files=True,
         on_change=reset_state
     )
 
-    if uploaded_files and len(uploaded_files) > 4:
-        st.error("❌ Solo puede subir hasta **4 archivos** PDF.")
+    if uploaded_files and len(uploaded_files) > MAX_FILES_PER_BATCH:
+        st.error(f"❌ Solo puede subir hasta **{MAX_FILES_PER_BATCH} archivos** PDF.")
         uploaded_files = []   
 
 with col_instruct:
     st.info("**Instrucciones:**\n1. Suba los archivos.\n2. El sistema clasificará automáticamente.\n3. Valide los campos extraídos.\n4. Exporte el reporte organizado.")
 
-if uploaded_files and not st.session_state.processing_complete:
+with st.expander("🔎 Buscar en documentos procesados"):
+    query = st.text_input("Número de identificación, nombre, póliza, NIT...", key="search_query")
+    if query:
+        render_search_results(query)
+
+if uploaded_files and not st.session_state.processing_complete and not st.session_state.job_id:
     if st.button("⚡ Iniciar Procesamiento con Azure AI Document Intelligence", type="primary"):
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-        results = []
-        
-        for i, archivo in enumerate(uploaded_files):
-            status_text.text(f"Analizando: {archivo.name}...")
+        job_store.purge_expired()
+        purge_spool(keep=job_store.referenced_handles())
+
+        files = []
+        for archivo in uploaded_files:
             archivo.seek(0)
-            bytes_data = archivo.read()
+            files.append((archivo.name, archivo.read()))
+
+        st.session_state.job_id = submit_job(files)
+        st.query_params["job"] = st.session_state.job_id
+        st.rerun()
+
+@st.fragment(run_every=1.0)
+def job_progress_panel(job_id):
+    """Consulta el avance del trabajo en segundo plano sin re-ejecutar toda la página."""
+    progress = job_store.progress(job_id)
+    if progress["total"] == 0:
+        st.warning("No se encontró el trabajo solicitado (los trabajos vencidos se eliminan).")
+        return
+    if progress["done"]:
+        load_job_results(job_id)
+        st.rerun()
+    ensure_worker()
+    loaded = len(st.session_state.processed_data or []) + len(st.session_state.get("job_errors", []))
+    if progress["listo"] + progress["error"] > loaded:
+        # Muestra para revisión los documentos que ya terminaron, sin esperar al resto del lote.
+        load_job_results(job_id, complete=False)
+        st.rerun()
+
+    done = progress["listo"] + progress["error"]
+    st.progress(done / progress["total"])
+    st.text(f"Analizando documentos en segundo plano ({done}/{progress['total']})...")
+
+@st.fragment
+def document_panel(i):
+    """
+    Encabezado, vista previa y formulario de un documento. Es un fragmento:
+    editar un campo re-ejecuta solo este panel y no la página completa.
+    """
+    if st.session_state.pop("needs_app_rerun", False):
+        st.rerun(scope="app")
+
+    start = metrics.clock()
+    doc = st.session_state.processed_data[i]
+    
+    icon_map = {
+        "cedula": "🆔",
+        "acta_seguro": "🚗",
+        "contrato": "⚖️",
+        "desconocido": "❓"
+    }
+
+    tipo = doc['tipo']
+    icon = icon_map.get(tipo, "📄")
+
+    if tipo == "desconocido":
+        col_tipo = "red"
+    else:
+        col_tipo = "blue"
+    
+    if doc.get('estado') == 'Revisar':
+        col_status = "red"
+        status_text = "🚨 REVISAR"
+    elif doc.get('estado') == 'Validado':
+        col_status = "green"
+        status_text = "✅ VALIDADO"
+    else:
+        col_status = "blue"
+        status_text = tipo.upper() 
+        
+    with st.expander(
+        f"{icon} {doc['file_name']} | Tipo: **:{col_tipo}[{tipo.upper()}]** ({doc.get('confianza', 1.0):.0%})  Estado: **:{col_status}[{status_text}]**",
+        expanded=(doc.get('estado') == 'Revisar') 
+    ):
+        
+        col_pdf, col_form = st.columns([0.45, 0.55], gap="large")
+        
+        with col_pdf:
+            if st.toggle("📄 Vista Previa", key=f"preview{i}"):
+                display_pdf(doc["handle"], key=f"preview{i}", file_name=doc["file_name"])
+            if st.toggle("Ver JSON de Azure", key=f"debug{i}"):
+                azure_json = load_json(doc["handle"])
+                if azure_json is None:
+                    st.info("El resultado de Azure de este documento ya no está disponible.")
+                else:
+                    st.json(azure_json, expanded=False)
             
-            try:
-                azure_json = analyze_bytes_document(bytes_data)
-                texto = azure_json.get("content", "")
-                tipo = classify_document(texto)
-                extraccion = extract_structured_data(tipo, azure_json)
-                
-                results.append({
-                    "file_name": archivo.name, "bytes": bytes_data,
-                    "tipo": tipo, "extraccion": extraccion,
-                    "raw_json": azure_json, "estado": "Revisar", "validacion": []
-                })
-            except Exception as e:
-                st.error(f"Error en {archivo.name}: {str(e)}")
+        with col_form:
+            st.markdown("---")
+
+            if doc.get('duplicado'):
+                origen = doc['duplicado']
+                st.info(f"♻️ Duplicado {origen['tipo']} de **{origen['file_name']}**: se reutilizó su extracción.")
             
-            progress_bar.progress((i + 1) / len(uploaded_files))
-        
-        st.session_state.processed_data = results
-        st.session_state.processing_complete = True
-        status_text.empty()
-        for i in range(len(results)): revalidate_document(i)
-        st.rerun()
+            if doc.get('validacion'):
+                st.error("Documento con errores de validación en los siguientes campos:")
+                for key in doc['extraccion']:
+                    if key in doc['validacion']:
+                        st.text(f"- **{key.replace('_', ' ').title()}**")
+            
+            if doc['tipo'] == 'cedula':
+                render_cedula_form(i)
+            elif doc['tipo'] == 'acta_seguro':
+                render_seguro_form(i)
+            elif doc['tipo'] == 'contrato':
+                render_contrato_form(i)
+            else:
+                render_generic_form(i)
+
+    metrics.observe("render_document", start, doc["tipo"])
+
+if st.session_state.job_id and not st.session_state.processing_complete:
+    job_progress_panel(st.session_state.job_id)
+
+for file_name, error in st.session_state.get("job_errors", []):
+    st.error(f"Error en {file_name}: {error}")
 
 def is_data_valid_for_export():
     """
     Verifica si todos los documentos en el estado tienen el estado 'Validado'.
     Retorna True si todos son válidos, False si hay al menos uno en 'Revisar'.
     """
-    if 'processed_data' not in st.session_state or not st.session_state.processed_data:
+    if not st.session_state.processing_complete or not st.session_state.get("processed_data"):
         return False 
 
-    documents_to_review = [d for d in st.session_state.processed_data if d.get("estado") == "Revisar"]
-    
-    return len(documents_to_review) == 0
+    return get_summary()["revisar"] == 0
 
-if st.session_state.processing_complete and st.session_state.processed_data:
+if st.session_state.processed_data:
     
     data_is_ok = is_data_valid_for_export()
-    
-    docs_to_review = sum(1 for d in st.session_state.processed_data if d.get("estado") == "Revisar")
+    summary = get_summary()
 
     st.markdown("### 📊 Resumen del Lote")
-    m1, m2, m3, m4, m5, m6 = st.columns(6) 
-    m1.metric("Total Documentos", len(st.session_state.processed_data))
-    m2.metric("Cédulas", sum(1 for d in st.session_state.processed_data if d['tipo'] == 'cedula'))
-    m3.metric("Actas de Seguro", sum(1 for d in st.session_state.processed_data if d['tipo'] == 'acta_seguro'))
-    m4.metric("Contratos", sum(1 for d in st.session_state.processed_data if d['tipo'] == 'contrato'))
-    m5.metric("Desconocidos", sum(1 for d in st.session_state.processed_data if d['tipo'] == 'desconocido'))
-    m6.metric("🚨 Pendientes Revisión", docs_to_review) 
+    m1, m2, m3, m4, m5, m6, m7 = st.columns(7)
+    m1.metric("Total Documentos", summary["total"])
+    m2.metric("Cédulas", summary["por_tipo"].get("cedula", 0))
+    m3.metric("Actas de Seguro", summary["por_tipo"].get("acta_seguro", 0))
+    m4.metric("Contratos", summary["por_tipo"].get("contrato", 0))
+    m5.metric("Desconocidos", summary["por_tipo"].get("desconocido", 0))
+    m6.metric("🚨 Pendientes Revisión", summary["revisar"])
+    m7.metric("♻️ Duplicados", summary["duplicados"])
     
     st.divider()
     
     c_tools_1, c_tools_2 = st.columns([3, 1])
     with c_tools_1:
         st.subheader("🔍 Validación Detallada")
-        if not data_is_ok:
+        if not st.session_state.processing_complete:
+            st.info("⏳ El lote se sigue procesando: los documentos aparecen aquí a medida que terminan y ya pueden revisarse.")
+        elif not data_is_ok:
             st.warning("⚠️ **Bloqueado:** No se puede descargar el reporte. Existen **documentos con errores** que requieren corrección y validación completa.")
         else:
             st.success("✅ Todos los documentos han sido **validados** y están listos para la exportación.")
 
     with c_tools_2:
         try:
-            excel_data = generate_excel(st.session_state.processed_data)
+            excel_data = get_excel_report() if data_is_ok else b""
             
             st.download_button(
                 label="📥 Descargar Reporte Excel",
@@ -149,59 +257,28 @@ if st.session_state.processing_complete and st.session_state.processed_data:
             st.error(f"Error generando Excel: {e}")    
 
     st.divider()
-    
-    for i, doc in enumerate(st.session_state.processed_data):
-        
-        icon_map = {
-            "cedula": "🆔",
-            "acta_seguro": "🚗",
-            "contrato": "⚖️",
-            "desconocido": "❓"
-        }
-    
-        tipo = doc['tipo']
-        icon = icon_map.get(tipo, "📄")
 
-        if tipo == "desconocido":
-            col_tipo = "red"
-        else:
-            col_tipo = "blue"
-        
-        if doc.get('estado') == 'Revisar':
-            col_status = "red"
-            status_text = "🚨 REVISAR"
-        elif doc.get('estado') == 'Validado':
-            col_status = "green"
-            status_text = "✅ VALIDADO"
-        else:
-            col_status = "blue"
-            status_text = tipo.upper() 
-            
-        with st.expander(
-            f"{icon} {doc['file_name']} | Tipo: **:{col_tipo}[{tipo.upper()}]**  Estado: **:{col_status}[{status_text}]**",
-            expanded=(doc.get('estado') == 'Revisar') 
-        ):
-            
-            col_pdf, col_form = st.columns([0.45, 0.55], gap="large")
-            
-            with col_pdf:
-                st.caption("📄 Vista Previa")
-                display_pdf(doc["bytes"])
-                
-            with col_form:
-                st.markdown("---")
-                
-                if doc.get('validacion'):
-                    st.error("Documento con errores de validación en los siguientes campos:")
-                    for error_msg in doc['validacion']:
-                        field_name = error_msg.split(':')[0].strip()
-                        st.text(f"- **{field_name}**")
-                
-                if doc['tipo'] == 'cedula':
-                    render_cedula_form(i)
-                elif doc['tipo'] == 'acta_seguro':
-                    render_seguro_form(i)
-                elif doc['tipo'] == 'contrato':
-                    render_contrato_form(i)
-                else:
-                    render_generic_form(i)
+    f_estado, f_tipo, f_size = st.columns([1, 2, 1])
+    estado_filter = f_estado.selectbox("Estado", ["Todos", "Revisar", "Validado"], key="filter_estado")
+    tipo_filter = f_tipo.multiselect("Tipo", ["cedula", "acta_seguro", "contrato", "desconocido"], key="filter_tipo")
+    page_size = f_size.selectbox("Documentos por página", PAGE_SIZES, key="page_size")
+
+    visible = filter_documents(
+        st.session_state.processed_data,
+        estado=None if estado_filter == "Todos" else estado_filter,
+        tipos=tipo_filter
+    )
+    st.caption(f"{len(visible)} de {summary['total']} documentos")
+
+    for i in paginate(visible, page_size):
+        document_panel(i)
+
+if metrics.enabled():
+    with st.sidebar.expander("🛠️ Métricas de rendimiento"):
+        if st.button("Reiniciar métricas"):
+            metrics.reset()
+        tab_json, tab_prom = st.tabs(["JSON", "Prometheus"])
+        with tab_json:
+            st.json(metrics.snapshot(), expanded=False)
+        with tab_prom:
+            st.code(metrics.to_prometheus(), language="text")
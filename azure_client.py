@@ -1,26 +1,155 @@
-import os
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.formrecognizer import DocumentAnalysisClient
-from dotenv import load_dotenv
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import metrics
+from config import env
+from cache import analysis_cache, document_key
+from scheduler import RequestScheduler
 
-load_dotenv()
+MAX_CONCURRENT_ANALYSES = int(env("MAX_CONCURRENT_ANALYSES", "4"))
+# Documentos con más páginas (o más bytes) que estos umbrales se analizan por partes.
+SPLIT_MIN_PAGES = int(env("SPLIT_MIN_PAGES", "20"))
+SPLIT_MIN_BYTES = int(env("SPLIT_MIN_BYTES", str(10 * 1024 * 1024)))
+CHUNK_PAGES = int(env("CHUNK_PAGES", "10"))
 
-ENDPOINT = os.getenv("ENDPOINT")
-KEY = os.getenv("KEY")
+PAGE_COUNT_PATTERN = re.compile(rb"/Type\s*/Pages\b.{0,200}?/Count\s+(\d+)|/Count\s+(\d+).{0,200}?/Type\s*/Pages\b", re.DOTALL)
+PAGE_OBJECT_PATTERN = re.compile(rb"/Type\s*/Page(?!s)\b")
 
-client = DocumentAnalysisClient(
-    endpoint=ENDPOINT,
-    credential=AzureKeyCredential(KEY)
-)
+_client = None
+_client_lock = threading.Lock()
 
-def analyze_bytes_document(document_bytes, model_id="prebuilt-read"):
+def get_client():
+    """
+    Devuelve el cliente de Azure compartido (y su pool de conexiones HTTP).
+    Se crea en la primera llamada, así importar el módulo no carga el SDK.
+    Con REPLAY_DIR se responde desde fixtures grabados, sin credenciales;
+    con RECORD_DIR cada respuesta real se graba en ese directorio.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client()
+    return _client
+
+def _create_client():
+    if env("REPLAY_DIR"):
+        from replay import ReplayClient
+        return ReplayClient(env("REPLAY_DIR"))
+
+    from azure.core.credentials import AzureKeyCredential
+    from azure.ai.formrecognizer import DocumentAnalysisClient
+
+    client = DocumentAnalysisClient(
+        endpoint=env("ENDPOINT"),
+        credential=AzureKeyCredential(env("KEY"))
+    )
+    if env("RECORD_DIR"):
+        from replay import RecordingClient
+        client = RecordingClient(client, env("RECORD_DIR"))
+    return client
+
+def set_client(client):
+    """Reemplaza el cliente compartido (p. ej. por uno local para pruebas)."""
+    global _client
+    with _client_lock:
+        _client = client
+
+scheduler = RequestScheduler(max_in_flight=MAX_CONCURRENT_ANALYSES)
+
+def _analyze_remote(document_bytes, model_id, pages=None):
+    options = {"pages": pages} if pages else {}
+    with metrics.timer("azure_request"):
+        poller = get_client().begin_analyze_document(
+            model_id=model_id,
+            document=document_bytes,
+            **options
+        )
+        return poller.result().to_dict()
+
+def analyze_bytes_document(document_bytes, model_id="prebuilt-read", use_cache=True, pages=None):
     """
     Envía los bytes de un documento a Azure Document Intelligence
     y devuelve el resultado como dict.
+    `pages` limita el análisis a un rango de páginas (ej. "1", "1-3,5").
+    Si el mismo documento ya fue analizado con el mismo modelo, el resultado
+    se toma de la caché en disco sin llamar a Azure. Las llamadas pasan por el
+    planificador, que aplica el límite de solicitudes y los reintentos.
     """
-    poller = client.begin_analyze_document(
-        model_id=model_id,
-        document=document_bytes
-    )
-    result = poller.result()
-    return result.to_dict()
+    cache_key = document_key(document_bytes, model_id, pages)
+    if use_cache:
+        cached = analysis_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    result = scheduler.run(_analyze_remote, document_bytes, model_id, pages)
+
+    if use_cache:
+        analysis_cache.set(cache_key, result)
+    return result
+
+def count_pdf_pages(document_bytes):
+    """
+    Cuenta aproximada de páginas leyendo el árbol /Pages del PDF, sin dependencias.
+    Devuelve None si no se puede determinar (p. ej. objetos comprimidos).
+    """
+    counts = [int(a or b) for a, b in PAGE_COUNT_PATTERN.findall(document_bytes)]
+    if counts:
+        return max(counts)
+    return len(PAGE_OBJECT_PATTERN.findall(document_bytes)) or None
+
+def page_ranges(page_count, chunk_pages=CHUNK_PAGES):
+    """Rangos "inicio-fin" de chunk_pages páginas que cubren el documento."""
+    return [
+        f"{start}-{min(start + chunk_pages - 1, page_count)}"
+        for start in range(1, page_count + 1, chunk_pages)
+    ]
+
+def _shift_spans(node, delta):
+    """Desplaza los offsets de todos los spans de un resultado de Azure."""
+    if isinstance(node, list):
+        for item in node:
+            _shift_spans(item, delta)
+    elif isinstance(node, dict):
+        for key, value in node.items():
+            if key in ("spans", "span"):
+                for span in value if isinstance(value, list) else [value]:
+                    span["offset"] = span.get("offset", 0) + delta
+            elif isinstance(value, (list, dict)):
+                _shift_spans(value, delta)
+
+def merge_results(results):
+    """
+    Une los resultados de varios rangos de páginas en uno solo: concatena
+    `content` y las listas (pages, paragraphs, tables, ...) ajustando los spans.
+    """
+    merged = {key: value for key, value in results[0].items() if not isinstance(value, list)}
+    contents = []
+    offset = 0
+    for result in results:
+        _shift_spans({k: v for k, v in result.items() if isinstance(v, list)}, offset)
+        for key, value in result.items():
+            if isinstance(value, list):
+                merged.setdefault(key, []).extend(value)
+        contents.append(result.get("content") or "")
+        offset += len(contents[-1]) + 1
+    merged["content"] = "\n".join(contents)
+    return merged
+
+def analyze_document(document_bytes, model_id="prebuilt-read", use_cache=True):
+    """
+    Analiza el documento completo. Si supera SPLIT_MIN_PAGES páginas o
+    SPLIT_MIN_BYTES bytes, se divide en rangos de CHUNK_PAGES páginas que se
+    analizan en paralelo y se unen en un único resultado.
+    """
+    page_count = count_pdf_pages(document_bytes)
+    too_large = page_count and (page_count > SPLIT_MIN_PAGES or len(document_bytes) > SPLIT_MIN_BYTES)
+    if not too_large or page_count <= CHUNK_PAGES:
+        return analyze_bytes_document(document_bytes, model_id, use_cache)
+
+    ranges = page_ranges(page_count)
+    with ThreadPoolExecutor(max_workers=min(len(ranges), MAX_CONCURRENT_ANALYSES)) as executor:
+        results = list(executor.map(
+            lambda pages: analyze_bytes_document(document_bytes, model_id, use_cache, pages), ranges
+        ))
+    return merge_results(results)
@@ -0,0 +1,58 @@
+"""
+Procesamiento por lotes sin interfaz gráfica.
+
+Uso:
+    python batch.py carpeta_pdfs --output Reporte.xlsx --workers 8
+"""
+import argparse
+import json
+import os
+import sys
+from azure_client import MAX_CONCURRENT_ANALYSES
+from document_utils import write_excel
+from pipeline import iter_pdf_paths, process_paths
+
+
+def run_batch(directory, output, workers=MAX_CONCURRENT_ANALYSES, recursive=False):
+    """
+    Procesa todos los PDF del directorio. Cada documento terminado se agrega
+    de inmediato a un archivo JSONL junto al reporte y se escribe como fila del
+    Excel consolidado, sin acumular el lote en memoria. Devuelve (procesados, errores).
+    """
+    jsonl_path = os.path.splitext(output)[0] + ".jsonl"
+    stats = {"processed": 0, "errors": 0}
+
+    def documents(jsonl):
+        for path, doc, error in process_paths(iter_pdf_paths(directory, recursive), workers):
+            if error:
+                stats["errors"] += 1
+                print(f"Error en {path}: {error}", file=sys.stderr)
+                continue
+
+            jsonl.write(json.dumps(doc, ensure_ascii=False) + "\n")
+            jsonl.flush()
+            stats["processed"] += 1
+            print(f"[{stats['processed']}] {doc['file_name']}: {doc['tipo']} ({doc['estado']})")
+            yield doc
+
+    with open(jsonl_path, "w", encoding="utf-8") as jsonl:
+        write_excel(documents(jsonl), output)
+
+    return stats["processed"], stats["errors"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Procesa una carpeta de PDF con Azure AI Document Intelligence.")
+    parser.add_argument("directory", help="Carpeta con los archivos PDF")
+    parser.add_argument("--output", default="Reporte_Extraccion_Consolidado.xlsx", help="Ruta del reporte Excel")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_ANALYSES, help="Análisis concurrentes")
+    parser.add_argument("--recursive", action="store_true", help="Incluir subcarpetas")
+    args = parser.parse_args(argv)
+
+    processed, errors = run_batch(args.directory, args.output, args.workers, args.recursive)
+    print(f"Procesados: {processed} | Errores: {errors} | Reporte: {args.output}")
+    return 1 if errors and not processed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""
+Benchmark de la caché de extracción sobre contratos sintéticos largos.
+
+Mide el lote sin caché, la primera pasada (misses, con el costo de calcular
+la clave) y una segunda pasada como la de un reprocesamiento (hits). Luego
+cambia la versión del extractor de contratos y verifica que solo se invalidan
+las entradas de ese tipo. Por último, verifica que dos procesos calculan las
+mismas versiones y que el segundo encuentra en disco (EXTRACTION_CACHE_PATH)
+lo que guardó el primero.
+
+Uso:
+    python benchmarks/bench_extraction_cache.py --documents 200 --clauses 500
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_extractors import layout_json, synthetic_contract
+import extractors
+from cache import extraction_cache
+from extractors import extract_structured_data
+
+CEDULA = (
+    "REPÚBLICA DE COLOMBIA\nIDENTIFICACIÓN PERSONAL\nCÉDULA DE CIUDADANÍA\nNÚMERO: 1.020.345.{n:03d}\n"
+    "APELLIDOS: PEREZ GOMEZ\nNOMBRES: JUAN CARLOS\nFECHA DE NACIMIENTO: 15-MAR-1990\n"
+    "LUGAR DE NACIMIENTO: BOGOTÁ D.C.\nESTATURA: 1.75 M\nRH: O+\nSEXO: M\n"
+    "FECHA DE EXPEDICIÓN: 20-MAR-2008\nLUGAR DE EXPEDICIÓN: BOGOTÁ D.C.\nÍNDICE DERECHO\n"
+)
+
+
+def timed_pass(batch, use_cache=True):
+    start = time.perf_counter()
+    results = [extract_structured_data(tipo, azure_json, use_cache) for tipo, azure_json in batch]
+    return time.perf_counter() - start, results
+
+
+def check_persistent_cache():
+    """Dos procesos con distinta semilla de hash comparten versiones y entradas en disco."""
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, EXTRACTION_CACHE_PATH=os.path.join(tmp, "extraction.sqlite"))
+        runs = []
+        for seed in ("1", "2"):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"], check=True,
+                                    capture_output=True, text=True, env=dict(env, PYTHONHASHSEED=seed)).stdout
+            runs.append(json.loads(output.splitlines()[-1]))
+    first, second = runs
+    print(f"  entre procesos: versiones {'iguales' if first['versions'] == second['versions'] else 'distintas'}, "
+          f"{second['hits']} hits en disco en el segundo")
+    assert first["versions"] == second["versions"], "SPEC_VERSIONS cambia entre procesos"
+    assert first["hits"] == 0 and second["hits"] == 1, "el segundo proceso no encontró la entrada en disco"
+
+
+def child():
+    extract_structured_data("contrato", layout_json(synthetic_contract(5)))
+    print(json.dumps({"versions": extractors.SPEC_VERSIONS, "hits": extraction_cache.hits}))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=200, help="Contratos distintos del lote")
+    parser.add_argument("--clauses", type=int, default=500, help="Cláusulas de relleno por bloque")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        return child()
+
+    contracts = [
+        ("contrato", layout_json(synthetic_contract(args.clauses).replace("2024-015", f"2024-{n:04d}")))
+        for n in range(args.documents)
+    ]
+    cedulas = [("cedula", layout_json(CEDULA.format(n=n))) for n in range(args.documents)]
+    extraction_cache.clear()
+
+    uncached, expected = timed_pass(contracts, use_cache=False)
+    cold, first = timed_pass(contracts)
+    warm, second = timed_pass(contracts)
+    assert first == expected and second == expected, "la caché cambió el resultado de la extracción"
+
+    docs_per_s = lambda seconds: args.documents / seconds
+    print(f"{args.documents} contratos de {len(contracts[0][1]['content']) // 1024} KB")
+    print(f"  sin caché       {uncached:8.3f} s  ({docs_per_s(uncached):9.1f} docs/s)")
+    print(f"  primera pasada  {cold:8.3f} s  ({docs_per_s(cold):9.1f} docs/s)")
+    print(f"  reprocesamiento {warm:8.3f} s  ({docs_per_s(warm):9.1f} docs/s, {uncached / warm:.1f}x)")
+
+    timed_pass(cedulas)
+    extractors.SPEC_VERSIONS["contrato"] = "otra-version"
+    hits = extraction_cache.hits
+    timed_pass(cedulas)
+    cedula_hits = extraction_cache.hits - hits
+    timed_pass(contracts)
+    contract_hits = extraction_cache.hits - hits - cedula_hits
+    print(f"  tras cambiar la versión de 'contrato': {cedula_hits} hits de cédula, {contract_hits} hits de contrato")
+    assert cedula_hits == len(cedulas), "cambiar un extractor invalidó entradas de otro tipo"
+    assert contract_hits == 0, "las entradas de la versión anterior siguen vigentes"
+
+    check_persistent_cache()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Micro-benchmark de extracción sobre contratos sintéticos grandes.
+
+Compara el motor de extractors.py (patrones precompilados, texto normalizado
+una vez, búsqueda desde el anclaje) con el recorrido anterior: una búsqueda
+re.search sobre todo el texto por cada campo.
+
+Uso:
+    python benchmarks/bench_extractors.py --clauses 2000 --repeat 20
+"""
+import argparse
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from extractors import EXTRACTION_SPECS, extract_structured_data
+
+CONTRATO_HEAD = (
+    "CONTRATO DE PRESTACIÓN DE SERVICIOS PROFESIONALES No. 2024-015\n"
+    "Entre los suscritos, por una parte, Tecnologías Andinas S.A.S., sociedad identificada con "
+    "NIT 900.123.456-7, y por otra parte, Laura Restrepo Díaz, identificada con cédula de "
+    "ciudadanía No. 43.987.654,\n"
+    "CLÁUSULA PRIMERA - OBJETO: El contratista se obliga a prestar servicios de consultoría.\n"
+)
+CONTRATO_TAIL = (
+    "CLÁUSULA SEGUNDA - DURACIÓN: seis meses contados a partir del 1 de febrero de 2024 "
+    "y hasta el 31 de julio de 2024.\n"
+    "CLÁUSULA TERCERA - VALOR: El valor total del contrato es de $45.000.000 COP.\n"
+    "Para constancia se firma a los 25 días del mes de enero de 2024.\n"
+)
+CLAUSE = "PARÁGRAFO: El contratista cumplirá las obligaciones del presente documento conforme a la ley.\n"
+
+
+def synthetic_contract(clauses):
+    """Contrato con cláusulas de relleno antes y después de los campos clave."""
+    return CONTRATO_HEAD + CLAUSE * clauses + CONTRATO_TAIL + CLAUSE * clauses
+
+
+def layout_json(content):
+    """Resultado mínimo de Azure con una línea por renglón, como lo devuelve prebuilt-read."""
+    lines, offset = [], 0
+    for n, line in enumerate(content.split("\n")):
+        lines.append({"content": line, "polygon": [{"x": 0.0, "y": float(n)}],
+                      "spans": [{"offset": offset, "length": len(line)}]})
+        offset += len(line) + 1
+    return {"content": content, "pages": [{"page_number": 1, "lines": lines}]}
+
+
+def extract_per_field_scan(document_type, azure_json):
+    """Recorrido anterior: normalización por tipo y re.search completo por campo."""
+    text = azure_json.get("content", "").lower()
+    spec = EXTRACTION_SPECS[document_type]
+    text = spec.normalize(text)
+    output = {}
+    for f in spec.fields:
+        match = re.search(f.pattern.pattern, text, re.DOTALL | re.IGNORECASE)
+        val = match.group(1).strip() if match and match.group(1) else None
+        if val and f.cleaning_func:
+            val = f.cleaning_func(val)
+        if val is not None:
+            output[f.name] = {"value": val}
+    return output
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clauses", type=int, default=2000, help="Cláusulas de relleno por bloque")
+    parser.add_argument("--repeat", type=int, default=20, help="Repeticiones por medición")
+    args = parser.parse_args(argv)
+
+    azure_json = {"content": synthetic_contract(args.clauses)}
+    with_layout = layout_json(azure_json["content"])
+    assert extract_structured_data("contrato", azure_json) == extract_per_field_scan("contrato", azure_json)
+
+    before = min(timeit.repeat(lambda: extract_per_field_scan("contrato", azure_json), number=args.repeat, repeat=3))
+    after = min(timeit.repeat(lambda: extract_structured_data("contrato", azure_json, use_cache=False), number=args.repeat, repeat=3))
+    layout = min(timeit.repeat(lambda: extract_structured_data("contrato", with_layout, use_cache=False), number=args.repeat, repeat=3))
+
+    size_kb = len(azure_json["content"]) / 1024
+    print(f"Contrato sintético: {size_kb:.0f} KB")
+    print(f"Búsqueda completa por campo: {before / args.repeat * 1000:.2f} ms/doc")
+    print(f"Motor precompilado:          {after / args.repeat * 1000:.2f} ms/doc")
+    print(f"Motor con layout de Azure:   {layout / args.repeat * 1000:.2f} ms/doc")
+    print(f"Aceleración: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
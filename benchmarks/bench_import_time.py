@@ -0,0 +1,73 @@
+"""
+Benchmark de tiempo de importación con `python -X importtime`.
+
+Mide el tiempo acumulado de importar cada módulo del núcleo en un proceso
+nuevo y falla (código de salida 1) si alguno supera su presupuesto o si
+carga dependencias pesadas que deberían importarse de forma diferida.
+
+Uso:
+    python benchmarks/bench_import_time.py
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Presupuesto en milisegundos (tiempo acumulado, mejor de varias corridas).
+IMPORT_BUDGETS_MS = {
+    "extractors": 50,
+    "document_utils": 80,
+    "azure_client": 150,
+    "pipeline": 200,
+    "batch": 250,
+}
+
+# Módulos que ningún import del núcleo debe cargar.
+DEFERRED_MODULES = ["azure.ai.formrecognizer", "azure.core", "streamlit", "pandas", "xlsxwriter"]
+
+RUNS = 3
+
+
+def import_time_ms(module):
+    """Tiempo acumulado de importar `module` según -X importtime."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    for line in reversed(result.stderr.splitlines()):
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1]) / 1000
+    raise RuntimeError(f"No se encontró {module} en la salida de importtime")
+
+
+def loaded_heavy_modules(module):
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return [m for m in result.stdout.strip().split(",") if m]
+
+
+def main():
+    failures = []
+    for module, budget in IMPORT_BUDGETS_MS.items():
+        elapsed = min(import_time_ms(module) for _ in range(RUNS))
+        heavy = loaded_heavy_modules(module)
+        ok = elapsed <= budget and not heavy
+        print(f"{module:16s} {elapsed:7.1f} ms  (presupuesto {budget} ms){'' if ok else '  <-- FALLA'}")
+        if heavy:
+            print(f"{'':16s} carga módulos pesados: {', '.join(heavy)}")
+        if not ok:
+            failures.append(module)
+
+    if failures:
+        print(f"Fuera de presupuesto: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
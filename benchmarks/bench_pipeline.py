@@ -0,0 +1,205 @@
+"""
+Benchmark de extremo a extremo sin credenciales de Azure.
+
+Genera cédulas, actas y contratos sintéticos, los analiza con el cliente de
+replay (latencia y errores configurables) por el mismo flujo por etapas que el
+hilo de trabajos (run_stages con la etapa "analyze" de jobs.PIPELINE_STAGES) y
+mide por etapa (analyze, classify, extract, validate, export) la latencia
+p50/p95, los documentos por segundo y el pico de memoria (RSS). Cada tamaño de lote corre en un proceso aparte para
+que el pico de RSS sea independiente.
+
+Uso:
+    python benchmarks/bench_pipeline.py --sizes 4 100 10000 --latency 0.05 --error-rate 0.02
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+STAGES = ("analyze", "classify", "extract", "validate", "export")
+
+CEDULA = (
+    "REPÚBLICA DE COLOMBIA IDENTIFICACIÓN PERSONAL CÉDULA DE CIUDADANÍA\n"
+    "NÚMERO: 1.020.{n:03d}.{m:03d}\n"
+    "APELLIDOS: PEREZ GOMEZ\n"
+    "NOMBRES: JUAN CARLOS\n"
+    "FECHA DE NACIMIENTO: 12-MAR-1990\n"
+    "LUGAR DE NACIMIENTO: BOGOTÁ D.C. (CUNDINAMARCA)\n"
+    "ESTATURA: 1.75 M RH: O+ SEXO: M\n"
+    "FECHA DE EXPEDICIÓN: 20-ABR-2008\n"
+    "LUGAR DE EXPEDICIÓN: BOGOTÁ D.C.\n"
+    "ÍNDICE DERECHO"
+)
+ACTA = (
+    "CERTIFICADO DE COBERTURA Y ACTA DE SEGURO\n"
+    "1. Datos de la póliza\n"
+    "Número de Póliza: AUT-2024-{n:05d}\n"
+    "Ramo: Automóviles • Tomador / Asegurado: María Fernanda López Ruiz • Identificación: C.C. 52.{m:03d}.456\n"
+    "Vigencia\n"
+    "Fecha de inicio: 1 de enero de 2024 a las 00:00 • Fecha de fin: 31 de diciembre de 2024 a las 23:59\n"
+    "Resumen de coberturas\n"
+    "2. Responsabilidad Civil Extracontractual: $ 1.000.000.000 COP\n"
+    "Estado de la póliza: VIGENTE"
+)
+CONTRATO = (
+    "CONTRATO DE PRESTACIÓN DE SERVICIOS PROFESIONALES No. 2024-{n:05d}\n"
+    "Entre los suscritos, por una parte, Tecnologías Andinas S.A.S., sociedad identificada con "
+    "NIT 900.123.456-7, y por otra parte, Laura Restrepo Díaz, identificada con cédula de "
+    "ciudadanía No. 43.{m:03d}.654,\n"
+    "CLÁUSULA PRIMERA - OBJETO: El contratista se obliga a prestar servicios de consultoría.\n"
+    "CLÁUSULA SEGUNDA - DURACIÓN: seis meses contados a partir del 1 de febrero de 2024 "
+    "y hasta el 31 de julio de 2024.\n"
+    "CLÁUSULA TERCERA - VALOR: El valor total del contrato es de $45.000.000 COP.\n"
+    "Para constancia se firma a los 25 días del mes de enero de 2024."
+)
+TEMPLATES = (CEDULA, ACTA, CONTRATO)
+
+
+def synthetic_documents(count):
+    """Bytes de documentos distintos (para que la caché no los colapse), rotando los tres tipos."""
+    for i in range(count):
+        text = TEMPLATES[i % len(TEMPLATES)].format(n=i % 100000, m=i // 100000 % 1000)
+        yield f"doc_{i:06d}.pdf", text.encode("utf-8")
+
+
+def synthetic_azure_json(document_bytes, model_id, pages=None):
+    """Respuesta con la forma de result.to_dict(): contenido y líneas con spans."""
+    content = document_bytes.decode("utf-8")
+    lines, offset = [], 0
+    for n, line in enumerate(content.split("\n")):
+        lines.append({"content": line, "polygon": [{"x": 0.0, "y": float(n)}],
+                      "spans": [{"offset": offset, "length": len(line)}]})
+        offset += len(line) + 1
+    return {"model_id": model_id, "content": content,
+            "pages": [{"page_number": 1, "lines": lines, "spans": [{"offset": 0, "length": len(content)}]}]}
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run(size, latency, jitter, error_rate, workers):
+    """Procesa un lote de `size` documentos y devuelve las métricas como dict."""
+    import azure_client
+    from document_utils import classify_document_scored, validate_document, write_excel
+    from extractors import extract_structured_data
+    from jobs import PIPELINE_STAGES
+    from pipeline import run_stages
+    from replay import ReplayClient
+
+    client = ReplayClient(generator=synthetic_azure_json, latency=latency, jitter=jitter,
+                          error_rate=error_rate, retry_after=0, seed=size)
+    azure_client.set_client(client)
+
+    timings = {stage: [] for stage in STAGES}
+    analyze = next(func for name, func, _ in PIPELINE_STAGES if name == "analyze")
+
+    def timed_analyze(item):
+        start = time.perf_counter()
+        item = analyze(item)
+        timings["analyze"].append(time.perf_counter() - start)
+        return item
+
+    def build(item):
+        azure_json = item.pop("azure_json")
+        start = time.perf_counter()
+        tipo, confianza = classify_document_scored(azure_json.get("content", ""))
+        timings["classify"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        extraccion = extract_structured_data(tipo, azure_json)
+        timings["extract"].append(time.perf_counter() - start)
+
+        doc = {"file_name": item["file_name"], "tipo": tipo, "confianza": confianza,
+               "extraccion": extraccion, "estado": "Revisar", "validacion": {}}
+        start = time.perf_counter()
+        validate_document(doc)
+        timings["validate"].append(time.perf_counter() - start)
+        item["doc"] = doc
+        return item
+
+    def documents():
+        items = ({"file_name": name, "bytes": payload} for name, payload in synthetic_documents(size))
+        for item in run_stages(items, [("analyze", timed_analyze, workers), ("build", build, 1)]):
+            if "error" in item:
+                continue
+
+            # El tiempo hasta que el escritor pide el siguiente documento es el de exportar esta fila.
+            start = time.perf_counter()
+            yield item["doc"]
+            timings["export"].append(time.perf_counter() - start)
+
+    output = os.path.join(tempfile.mkdtemp(), "bench.xlsx")
+    start = time.perf_counter()
+    write_excel(documents(), output)
+    elapsed = time.perf_counter() - start
+
+    processed = len(timings["validate"])
+    return {
+        "size": size,
+        "processed": processed,
+        "seconds": elapsed,
+        "docs_per_sec": processed / elapsed if elapsed else 0.0,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "requests": client.requests,
+        "injected_errors": client.errors,
+        "retries": azure_client.scheduler.stats()["retries"],
+        "stages": {
+            stage: {"p50_ms": percentile(values, 0.50) * 1000, "p95_ms": percentile(values, 0.95) * 1000}
+            for stage, values in timings.items()
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 100, 10000])
+    parser.add_argument("--latency", type=float, default=0.0, help="Latencia simulada por solicitud (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variación de la latencia (± s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fracción de solicitudes con 429")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(run(args.child, args.latency, args.jitter, args.error_rate, args.workers)))
+        return
+
+    results = []
+    for size in args.sizes:
+        # Caché, spool y límite de solicitudes aislados para cada corrida.
+        env = dict(os.environ, CACHE_PATH=os.path.join(tempfile.mkdtemp(), "analysis.sqlite"),
+                   SPOOL_DIR=tempfile.mkdtemp(), MAX_REQUESTS_PER_SECOND=os.environ.get("MAX_REQUESTS_PER_SECOND", "0"),
+                   RETRY_BASE_SECONDS=os.environ.get("RETRY_BASE_SECONDS", "0.01"))
+        command = [sys.executable, os.path.abspath(__file__), "--child", str(size),
+                   "--latency", str(args.latency), "--jitter", str(args.jitter),
+                   "--error-rate", str(args.error_rate), "--workers", str(args.workers)]
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    for r in results:
+        print(f"\n{r['size']} documentos: {r['processed']} procesados en {r['seconds']:.2f}s "
+              f"({r['docs_per_sec']:.1f} docs/s), pico RSS {r['peak_rss_mb']:.1f} MB, "
+              f"{r['requests']} solicitudes, {r['injected_errors']} errores simulados, {r['retries']} reintentos")
+        for stage in STAGES:
+            s = r["stages"][stage]
+            print(f"  {stage:<9} p50 {s['p50_ms']:8.3f} ms   p95 {s['p95_ms']:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark de DocumentRecord frente a los dicts de documento.
+
+Mide la memoria de N documentos en ambas formas y el tiempo de agregación
+(resumen del lote), revalidación completa y exportación a Excel.
+
+Uso:
+    python benchmarks/bench_records.py --documents 50000
+"""
+import argparse
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_utils import validate_document, write_excel
+from records import DocumentRecord, revalidate_records, summarize
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_pipeline import synthetic_documents, synthetic_azure_json
+from pipeline import build_document
+
+
+def timed(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    print(f"  {label:<14} {time.perf_counter() - start:7.3f}s")
+    return result
+
+
+def measure(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def summarize_dicts(docs):
+    """Resumen como lo calcula la aplicación: una pasada por cada métrica."""
+    return {
+        "total": len(docs),
+        "por_tipo": {t: sum(1 for d in docs if d["tipo"] == t) for t in ("cedula", "acta_seguro", "contrato", "desconocido")},
+        "revisar": sum(1 for d in docs if d.get("estado") == "Revisar"),
+        "duplicados": sum(1 for d in docs if d.get("duplicado")),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de DocumentRecord")
+    parser.add_argument("--documents", type=int, default=50000)
+    args = parser.parse_args()
+
+    templates = [build_document(name, synthetic_azure_json(data, "prebuilt-read"))
+                 for name, data in synthetic_documents(3)]
+    # Copias independientes de los documentos, como quedan tras cargar un lote desde JSON.
+    payloads = [json.dumps(t) for t in templates]
+
+    docs, dict_bytes = measure(lambda: [json.loads(payloads[i % 3]) for i in range(args.documents)])
+    records, record_bytes = measure(
+        lambda: [DocumentRecord.from_dict(json.loads(payloads[i % 3])) for i in range(args.documents)]
+    )
+    print(f"{args.documents} documentos")
+    print(f"  memoria dicts   {dict_bytes / 1e6:7.1f} MB")
+    print(f"  memoria records {record_bytes / 1e6:7.1f} MB")
+
+    print("dicts:")
+    timed("resumen", summarize_dicts, docs)
+    timed("revalidación", lambda: [validate_document(d) for d in docs])
+    timed("exportación", write_excel, docs, io.BytesIO())
+    print("records:")
+    timed("resumen", summarize, records)
+    timed("revalidación", revalidate_records, records)
+    timed("exportación", write_excel, records, io.BytesIO())
+
+    assert [r.to_dict() for r in records[:3]] == docs[:3]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Benchmark del reprocesamiento masivo con procesos (reprocess.py).
+
+Genera un archivo JSONL de resultados de Azure sintéticos (cédulas, actas y
+contratos con cláusulas de relleno), lo reprocesa con 1, 2, 4... procesos
+hasta el número de núcleos y reporta documentos por segundo y la aceleración
+respecto de un proceso. Verifica que el resultado y su orden no cambian, y
+que run_reprocess no sobrescribe el archivo de entrada con sus salidas.
+
+Uso:
+    python benchmarks/bench_reprocess.py --documents 3000 --clauses 200
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_pipeline import synthetic_azure_json, synthetic_documents
+from bench_extractors import CLAUSE
+from reprocess import main as reprocess_main, reprocess_archive, write_archive
+
+
+def archive_entries(count, clauses):
+    for name, document_bytes in synthetic_documents(count):
+        text = document_bytes.decode("utf-8")
+        if text.startswith("CONTRATO"):
+            text = text.replace("\n", "\n" + CLAUSE * clauses, 1)
+        yield name, None, synthetic_azure_json(text.encode("utf-8"), "prebuilt-read")
+
+
+def check_input_preserved(path):
+    """Las salidas de run_reprocess nunca deben sobrescribir el archivo de entrada."""
+    stem = os.path.splitext(path)[0]
+    sidecar = stem + ".reprocesado.jsonl"
+    shutil.copyfile(path, sidecar)
+    cases = [(path, stem + ".xlsx", True), (path, path, False), (sidecar, stem + ".xlsx", False)]
+    for source, output, accepted in cases:
+        with open(source, "rb") as f:
+            original = f.read()
+        try:
+            code = reprocess_main([source, "--output", output, "--workers", "2"])
+        except SystemExit as e:
+            code = e.code
+        with open(source, "rb") as f:
+            assert f.read() == original, f"--output {output} sobrescribió {source}"
+        assert (code == 0) == accepted, f"--output {output} con {source}: código {code}"
+    print("  las salidas no sobrescriben el archivo de entrada")
+
+
+def worker_counts(limit):
+    counts, n = [], 1
+    while n < limit:
+        counts.append(n)
+        n *= 2
+    return counts + [limit]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=3000)
+    parser.add_argument("--clauses", type=int, default=200, help="Cláusulas de relleno por contrato")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-bytes", type=int, default=1024 * 1024)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "archivo.jsonl")
+        write_archive(archive_entries(args.documents, args.clauses), path)
+        print(f"{args.documents} documentos, {os.path.getsize(path) / 1024 / 1024:.1f} MB, "
+              f"{os.cpu_count()} núcleos")
+
+        baseline = expected = None
+        for workers in worker_counts(args.max_workers):
+            start = time.perf_counter()
+            results = [(record.to_dict() if record else None, error)
+                       for record, error in reprocess_archive(path, workers, args.chunk_bytes)]
+            elapsed = time.perf_counter() - start
+            if expected is None:
+                baseline, expected = elapsed, results
+            assert len(results) == args.documents and results == expected, "el resultado cambió con la cantidad de procesos"
+            print(f"  {workers:3d} procesos  {elapsed:7.2f} s  {len(results) / elapsed:8.1f} docs/s  "
+                  f"aceleración {baseline / elapsed:4.1f}x")
+
+        check_input_preserved(path)
+
+
+if __name__ == "__main__":
+    main()
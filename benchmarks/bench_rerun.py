@@ -0,0 +1,118 @@
+"""
+Benchmark de re-ejecución de la interfaz al editar un campo, con N documentos cargados.
+
+Aplica la misma edición de dos maneras, ambas con streamlit.testing (AppTest):
+- Antes (página completa): re-ejecución completa de app.py, como ocurría
+  cuando cada on_change re-ejecutaba todo.
+- Después (fragmento): re-ejecución solo del fragmento `document_panel` del
+  documento editado, como la que pide el navegador al cambiar un widget del
+  fragmento.
+
+Usa el cliente de replay, sin credenciales.
+
+Uso:
+    python benchmarks/bench_rerun.py --documents 50 --edits 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+for name in ("CACHE_PATH", "JOBS_PATH", "DEDUP_PATH", "SEARCH_PATH"):
+    os.environ.setdefault(name, os.path.join(tempfile.mkdtemp(), "bench.sqlite"))
+os.environ.setdefault("SPOOL_DIR", tempfile.mkdtemp())
+
+import streamlit.testing.v1.local_script_runner as local_script_runner
+from streamlit.testing.v1 import AppTest
+from bench_pipeline import synthetic_documents, synthetic_azure_json
+from pipeline import build_document
+from spool import spool_document
+
+# AppTest siempre re-ejecuta la página completa; para medir el fragmento se
+# agrega a la solicitud de re-ejecución el fragmento que dibujó el widget.
+fragment_queue = []
+widget_fragments = {}
+_RerunData = local_script_runner.RerunData
+_parse_tree = local_script_runner.parse_tree_from_messages
+
+
+def rerun_data(**kwargs):
+    return _RerunData(fragment_id_queue=list(fragment_queue), is_fragment_scoped_rerun=bool(fragment_queue), **kwargs)
+
+
+def parse_tree(messages):
+    for msg in messages:
+        if msg.HasField("delta") and msg.delta.fragment_id and msg.delta.HasField("new_element"):
+            element = msg.delta.new_element
+            widget = getattr(element, element.WhichOneof("type") or "", None)
+            if getattr(widget, "id", None):
+                widget_fragments[widget.id] = msg.delta.fragment_id
+    return _parse_tree(messages)
+
+
+local_script_runner.RerunData = rerun_data
+local_script_runner.parse_tree_from_messages = parse_tree
+
+
+def load_documents(count):
+    docs = []
+    for name, data in synthetic_documents(count):
+        azure_json = synthetic_azure_json(data, "prebuilt-read")
+        doc = build_document(name, azure_json)
+        doc["handle"] = spool_document(data, azure_json)
+        docs.append(doc)
+    return docs
+
+
+def timed_edit(at, key, value, fragment_id=None):
+    """Edita el campo y mide la re-ejecución (completa o solo del fragmento)."""
+    at.text_input(key=key).set_value(value)
+    fragment_queue[:] = [fragment_id] if fragment_id else []
+    try:
+        start = time.perf_counter()
+        at.run()
+        return time.perf_counter() - start
+    finally:
+        fragment_queue.clear()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de re-ejecución al editar un campo")
+    parser.add_argument("--documents", type=int, default=50)
+    parser.add_argument("--edits", type=int, default=20)
+    args = parser.parse_args()
+
+    at = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=120)
+    at.session_state["processed_data"] = load_documents(args.documents)
+    at.session_state["processing_complete"] = True
+    at.session_state["page_size"] = 50
+    at.run()
+
+    keys = [w.key for w in at.text_input if w.key and w.key.startswith("doc") and w.key.endswith("-nombres")]
+    fragments = {key: widget_fragments.get(at.text_input(key=key).id) for key in keys}
+    assert keys and all(fragments.values()), "los campos editables no están dentro de un fragmento"
+
+    full_runs, fragment_runs = [], []
+    for n in range(args.edits):
+        key = keys[n % len(keys)]
+        full_runs.append(timed_edit(at, key, f"NOMBRE {n}"))
+        fragment_runs.append(timed_edit(at, key, f"NOMBRE {n} B", fragments[key]))
+        doc = at.session_state["processed_data"][int(key[3:].split("-")[0])]
+        assert doc["extraccion"]["nombres"]["value"] == f"NOMBRE {n} B", "la re-ejecución del fragmento no aplicó la edición"
+        at.run()  # el árbol de AppTest queda solo con el fragmento; se redibuja la página para la próxima edición
+
+    full_seconds = sum(full_runs) / len(full_runs)
+    fragment_seconds = sum(fragment_runs) / len(fragment_runs)
+    shown = min(args.documents, 50)
+    print(f"{args.documents} documentos cargados ({shown} visibles), {args.edits} ediciones")
+    print(f"Antes  (re-ejecución completa): {full_seconds * 1000:8.1f} ms")
+    print(f"Después (solo el fragmento):     {fragment_seconds * 1000:8.1f} ms")
+    print(f"Mejora: {full_seconds / fragment_seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
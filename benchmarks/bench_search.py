@@ -0,0 +1,78 @@
+"""
+Benchmark del índice de búsqueda (SQLite FTS5).
+
+Indexa N documentos sintéticos (cédulas, actas y contratos con números y
+nombres distintos) y mide la latencia de búsquedas por número de
+identificación, nombre y número de póliza.
+
+Uso:
+    python benchmarks/bench_search.py --documents 200000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from search import SearchIndex
+
+NOMBRES = ["JUAN CARLOS", "MARIA FERNANDA", "LAURA", "ANDRES FELIPE", "CAMILA", "JOSE LUIS", "VALENTINA", "SANTIAGO"]
+APELLIDOS = ["PEREZ GOMEZ", "LOPEZ RUIZ", "RESTREPO DIAZ", "MARTINEZ", "RODRIGUEZ", "GARCIA", "HERNANDEZ", "MORENO"]
+
+
+def synthetic_document(i, rng):
+    """Documento sintético con la forma de los que produce el pipeline."""
+    nombre = f"{rng.choice(NOMBRES)} {rng.choice(APELLIDOS)} {i}"
+    numero = f"{1000000000 + i:,}".replace(",", ".")
+    kind = i % 3
+    if kind == 0:
+        extraccion = {"numero_identificacion": {"value": numero}, "nombres": {"value": nombre}}
+        tipo, content = "cedula", f"CÉDULA DE CIUDADANÍA NÚMERO: {numero} NOMBRES: {nombre}"
+    elif kind == 1:
+        poliza = f"AUT-2024-{i:07d}"
+        extraccion = {"numero_poliza": {"value": poliza}, "asegurado": {"value": nombre}, "identificacion": {"value": numero}}
+        tipo, content = "acta_seguro", f"ACTA DE SEGURO Número de Póliza: {poliza} Asegurado: {nombre}"
+    else:
+        extraccion = {"numero_contrato": {"value": f"2024-{i}"}, "contratista_nombre": {"value": nombre},
+                      "contratante_nit": {"value": "900.123.456-7"}}
+        tipo, content = "contrato", f"CONTRATO No. 2024-{i} Entre los suscritos ... {nombre} ... NIT 900.123.456-7"
+    doc = {"handle": f"h{i}", "file_name": f"doc_{i}.pdf", "tipo": tipo, "estado": "Validado", "extraccion": extraccion}
+    return doc, content
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del índice de búsqueda")
+    parser.add_argument("--documents", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    index = SearchIndex(os.path.join(tempfile.mkdtemp(), "search.sqlite"))
+
+    start = time.perf_counter()
+    for i in range(args.documents):
+        index.index_document(*synthetic_document(i, rng))
+    print(f"Indexados {args.documents} documentos en {time.perf_counter() - start:.1f}s")
+
+    samples = {
+        "número de identificación": lambda i: f"{1000000000 + i:,}".replace(",", "."),
+        "nombre": lambda i: f"{NOMBRES[i % len(NOMBRES)]} {i}",
+        "número de póliza": lambda i: f"AUT-2024-{i - i % 3 + 1:07d}",
+    }
+    for label, make_query in samples.items():
+        latencies = []
+        for _ in range(args.queries):
+            query = make_query(rng.randrange(args.documents - 3))
+            start = time.perf_counter()
+            index.search(query)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"{label:<26} p50 {latencies[len(latencies) // 2] * 1000:7.2f} ms"
+              f"   p95 {latencies[int(len(latencies) * 0.95)] * 1000:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark de memoria de la sesión: N sesiones x 4 PDF.
+
+Compara documentos en sesión con `bytes` y `raw_json` completos contra
+documentos con solo el handle del spool y los campos extraídos.
+
+Uso:
+    python benchmarks/bench_session_memory.py --sessions 20 --pdf-kb 1500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("SPOOL_DIR", os.path.join(tempfile.mkdtemp(), "spool"))
+
+from extractors import extract_structured_data
+import spool
+
+CONTRATO = (
+    "CONTRATO DE PRESTACIÓN DE SERVICIOS PROFESIONALES No. 2024-015\n"
+    "Entre los suscritos, por una parte, Tecnologías Andinas S.A.S., sociedad identificada con "
+    "NIT 900.123.456-7, y por otra parte, Laura Restrepo Díaz, identificada con cédula de "
+    "ciudadanía No. 43.987.654,\n"
+    "CLÁUSULA PRIMERA - OBJETO: El contratista se obliga a prestar servicios de consultoría.\n"
+    "CLÁUSULA SEGUNDA - DURACIÓN: seis meses contados a partir del 1 de febrero de 2024.\n"
+) + "PARÁGRAFO: El contratista cumplirá las obligaciones del presente documento conforme a la ley.\n" * 400
+
+
+def synthetic_azure_json(content):
+    """JSON con la forma de result.to_dict(): líneas y palabras con polígonos y spans."""
+    lines, words, offset = [], [], 0
+    for n, line in enumerate(content.split("\n")):
+        polygon = [{"x": 0.5, "y": n * 0.2}, {"x": 7.5, "y": n * 0.2}, {"x": 7.5, "y": n * 0.2 + 0.15}, {"x": 0.5, "y": n * 0.2 + 0.15}]
+        lines.append({"content": line, "polygon": polygon, "spans": [{"offset": offset, "length": len(line)}]})
+        for word in line.split():
+            words.append({"content": word, "polygon": polygon, "span": {"offset": offset, "length": len(word)}, "confidence": 0.99})
+        offset += len(line) + 1
+    return {"model_id": "prebuilt-read", "content": content,
+            "pages": [{"page_number": 1, "width": 8.5, "height": 11, "unit": "inch", "lines": lines, "words": words}]}
+
+
+def build_sessions(sessions, pdf_kb, slim):
+    """Crea las listas processed_data de cada sesión, con o sin spool."""
+    all_sessions = []
+    for s in range(sessions):
+        processed_data = []
+        for d in range(4):
+            pdf_bytes = os.urandom(pdf_kb * 1024)
+            azure_json = synthetic_azure_json(CONTRATO)
+            doc = {"file_name": f"s{s}_d{d}.pdf", "tipo": "contrato",
+                   "extraccion": extract_structured_data("contrato", azure_json),
+                   "estado": "Revisar", "validacion": []}
+            if slim:
+                doc["handle"] = spool.spool_document(pdf_bytes, azure_json)
+            else:
+                doc["bytes"] = pdf_bytes
+                doc["raw_json"] = azure_json
+            processed_data.append(doc)
+        all_sessions.append(processed_data)
+    return all_sessions
+
+
+def measure(sessions, pdf_kb, slim):
+    tracemalloc.start()
+    data = build_sessions(sessions, pdf_kb, slim)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current, peak
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=20, help="Sesiones simultáneas")
+    parser.add_argument("--pdf-kb", type=int, default=1500, help="Tamaño de cada PDF en KB")
+    args = parser.parse_args(argv)
+
+    for label, slim in (("bytes + raw_json en sesión", False), ("handle del spool", True)):
+        current, peak = measure(args.sessions, args.pdf_kb, slim)
+        print(f"{label:28s} retenido: {current / 2**20:8.1f} MB  pico: {peak / 2**20:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
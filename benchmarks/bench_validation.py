@@ -0,0 +1,63 @@
+"""
+Benchmark de limpieza y validación por lotes.
+
+Compara sanitize_value/validate_field_format llamados valor por valor contra
+sanitize_column/validate_column sobre columnas de un dataset sintético
+(valores repetidos como en un reporte importado o corregido en bloque).
+
+Uso:
+    python benchmarks/bench_validation.py --rows 200000 --distinct 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from document_utils import sanitize_value, validate_field_format, sanitize_column, validate_column
+
+GENERATORS = {
+    "numero_identificacion": lambda rng: f"{rng.randrange(10**9):,}".replace(",", "."),
+    "nombres": lambda rng: rng.choice(["juan carlos", "MARÍA FERNANDA", "laura!!", "Andrés  Felipe"]) + f" {rng.randrange(100)}",
+    "sexo": lambda rng: rng.choice(["m", "F", " x", "M "]),
+    "rh": lambda rng: rng.choice(["o+", "AB-", "b+", "C+"]),
+    "estatura": lambda rng: f"1.{rng.randrange(40, 99)} M",
+    "fecha_nacimiento": lambda rng: f"{rng.randrange(1, 29):02d}-{rng.randrange(1, 13):02d}-{rng.randrange(1950, 2006)}",
+    "valor_contrato_monto": lambda rng: f"${rng.randrange(10**8):,} COP".replace(",", "."),
+    "cobertura_hurto": lambda rng: rng.choice(["100% valor comercial", "Incluida", "80%"]),
+}
+
+
+def column(key, rows, distinct, rng):
+    pool = [GENERATORS[key](rng) for _ in range(distinct)]
+    return [rng.choice(pool) for _ in range(rows)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de validación por lotes")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--distinct", type=int, default=5000, help="Valores distintos por columna")
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    dataset = {key: column(key, args.rows, args.distinct, rng) for key in GENERATORS}
+
+    start = time.perf_counter()
+    expected = {key: ([sanitize_value(key, v) for v in values], [validate_field_format(key, v) for v in values])
+                for key, values in dataset.items()}
+    per_value = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = {key: (sanitize_column(key, values), validate_column(key, values)) for key, values in dataset.items()}
+    bulk = time.perf_counter() - start
+
+    assert result == expected
+    cells = args.rows * len(dataset)
+    print(f"{cells} celdas ({args.distinct} valores distintos por columna)")
+    print(f"Valor por valor: {per_value:.2f}s  |  Por columna: {bulk:.2f}s  |  {per_value / bulk:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
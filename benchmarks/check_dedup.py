@@ -0,0 +1,64 @@
+"""
+Verificación de la detección de casi duplicados (dedup.py).
+
+Dos contratos de personas distintas con miles de palabras de plantilla en
+común tienen un SimHash casi igual. Solo deben tratarse como el mismo
+documento cuando ambos tienen el número de contrato y coincide; si falta en
+alguno, find_similar no debe devolver el otro. Termina con código 1 si falla.
+
+Uso:
+    python benchmarks/check_dedup.py
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup import DedupIndex, hamming_distance, simhash
+
+TEMPLATE = " ".join(f"cláusula {n}: el contratista cumplirá la obligación número {n} del contrato." for n in range(400))
+
+
+def contract(handle, person, numero):
+    extraccion = {"contratista_nombre": {"value": person}}
+    if numero:
+        extraccion["numero_contrato"] = {"value": numero}
+    return {"handle": handle, "file_name": f"{handle}.pdf", "tipo": "contrato", "confianza": 1.0,
+            "extraccion": extraccion}
+
+
+def main():
+    failures = []
+    with tempfile.TemporaryDirectory() as tmp:
+        index = DedupIndex(os.path.join(tmp, "dedup.sqlite"))
+        laura = contract("laura", "laura restrepo", "2024015")
+        fingerprint = simhash(f"contrato de laura restrepo {TEMPLATE}")
+        index.remember(laura, fingerprint)
+
+        other = simhash(f"contrato de pedro gomez {TEMPLATE}")
+        print(f"distancia entre contratos de personas distintas: {hamming_distance(fingerprint, other)}")
+
+        cases = [
+            ("mismo número", contract("laura-2", "laura restrepo", "2024015"), True),
+            ("otro número", contract("pedro", "pedro gomez", "2024099"), False),
+            ("sin número en el nuevo", contract("pedro", "pedro gomez", None), False),
+        ]
+        for label, doc, expected in cases:
+            found = index.find_similar(doc, other) is not None
+            print(f"  {label:<24} {'duplicado' if found else 'distinto':<10} {'ok' if found == expected else 'FALLA'}")
+            if found != expected:
+                failures.append(label)
+
+        index.remember(contract("sin-numero", "ana diaz", None), simhash(f"contrato de ana diaz {TEMPLATE} anexo"))
+        found = index.find_similar(contract("pedro-2", "pedro gomez", "2024099"), other)
+        ok = found is None or found["handle"] != "sin-numero"
+        print(f"  {'sin número en el previo':<24} {'distinto' if ok else 'duplicado':<10} {'ok' if ok else 'FALLA'}")
+        if not ok:
+            failures.append("sin número en el previo")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
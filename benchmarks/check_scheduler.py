@@ -0,0 +1,121 @@
+"""
+Verificación del planificador de solicitudes a Azure (scheduler.py) contra un
+cliente local que responde 429 con Retry-After.
+
+Comprueba que:
+- todas las solicitudes terminan bien pese a los 429, y tras un 429 ninguna
+  solicitud nueva comienza antes de Retry-After (la pausa es global);
+- nunca hay más de max_in_flight solicitudes en vuelo ni se supera el límite por segundo;
+- un 400 no se reintenta y un 429 persistente se abandona tras max_retries.
+Termina con código 1 si alguna comprobación falla.
+
+Uso:
+    python benchmarks/check_scheduler.py
+"""
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay import http_error
+from scheduler import RequestScheduler
+
+RETRY_AFTER = 0.3
+REQUESTS_PER_SECOND = 20
+MAX_IN_FLIGHT = 3
+TOLERANCE = 0.02
+
+
+class ThrottlingStub:
+    """Cliente local: cada `every`-ésima solicitud recibe 429 con Retry-After."""
+
+    def __init__(self, every=4, latency=0.02):
+        self.every = every
+        self.latency = latency
+        self.starts = []
+        self.throttled_at = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def analyze(self, n):
+        with self._lock:
+            now = time.monotonic()
+            self.starts.append(now)
+            count = len(self.starts)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if count % self.every == 0:
+                error = http_error(429, retry_after=str(RETRY_AFTER))
+                self.throttled_at.append(time.monotonic())
+                raise error
+            time.sleep(self.latency)
+            return n
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def check(label, ok, detail=""):
+    print(f"  {'ok   ' if ok else 'FALLA'} {label}{': ' + detail if detail else ''}")
+    return ok
+
+
+def main():
+    results = []
+    stub = ThrottlingStub()
+    scheduler = RequestScheduler(requests_per_second=REQUESTS_PER_SECOND, max_in_flight=MAX_IN_FLIGHT,
+                                 max_retries=5, base_delay=0.01)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        outputs = list(executor.map(lambda n: scheduler.run(stub.analyze, n), range(24)))
+
+    stats = scheduler.stats()
+    results.append(check("todas las solicitudes terminan", outputs == list(range(24)),
+                         f"{stats['throttled']} 429, {stats['retries']} reintentos"))
+    results.append(check("se recibieron 429", stats["throttled"] > 0))
+
+    waits = [min((s - t for s in stub.starts if s > t), default=RETRY_AFTER) for t in stub.throttled_at]
+    results.append(check("pausa global tras 429", min(waits) >= RETRY_AFTER - TOLERANCE,
+                         f"espera mínima {min(waits):.3f}s (Retry-After {RETRY_AFTER}s)"))
+    results.append(check("solicitudes en vuelo acotadas", stub.max_in_flight <= MAX_IN_FLIGHT,
+                         f"máximo {stub.max_in_flight} de {MAX_IN_FLIGHT}"))
+    gaps = [b - a for a, b in zip(stub.starts, stub.starts[1:])]
+    results.append(check("límite por segundo", min(gaps) >= 1 / REQUESTS_PER_SECOND - TOLERANCE,
+                         f"separación mínima {min(gaps):.3f}s"))
+
+    attempts = []
+
+    def bad_request():
+        attempts.append(1)
+        raise http_error(400)
+
+    try:
+        scheduler.run(bad_request)
+        raised = False
+    except Exception:
+        raised = True
+    results.append(check("un 400 no se reintenta", raised and len(attempts) == 1))
+
+    attempts.clear()
+
+    def always_throttled():
+        attempts.append(1)
+        raise http_error(429, retry_after="0.01")
+
+    persistent = RequestScheduler(requests_per_second=0, max_retries=2, base_delay=0.01)
+    try:
+        persistent.run(always_throttled)
+        raised = False
+    except Exception as e:
+        raised = getattr(e, "status_code", None) == 429
+    results.append(check("429 persistente se abandona", raised and len(attempts) == 3, f"{len(attempts)} intentos"))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
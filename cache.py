@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from config import env
+
+CACHE_PATH = env("CACHE_PATH", os.path.join(".smartdoc_cache", "analysis.sqlite"))
+CACHE_MAX_BYTES = int(env("CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+CACHE_TTL_SECONDS = int(env("CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+EXTRACTION_CACHE_SIZE = int(env("EXTRACTION_CACHE_SIZE", "2048"))
+# Vacío = la caché de extracción vive solo en memoria.
+EXTRACTION_CACHE_PATH = env("EXTRACTION_CACHE_PATH", "")
+
+
+def document_key(document_bytes, model_id, pages=None):
+    """
+    Clave de contenido: SHA-256 de los bytes del documento más el modelo usado
+    y, si el análisis fue parcial, el rango de páginas.
+    """
+    digest = hashlib.sha256()
+    digest.update(model_id.encode("utf-8"))
+    if pages:
+        digest.update(b"\0pages=" + pages.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(document_bytes)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Caché persistente en SQLite para payloads JSON.
+    Guarda los valores comprimidos con zlib, expulsa por LRU al superar
+    max_bytes y descarta entradas más antiguas que ttl_seconds (0 = sin TTL).
+    """
+
+    def __init__(self, path, max_bytes=CACHE_MAX_BYTES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY, payload BLOB NOT NULL, size INTEGER NOT NULL,"
+                " created REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        return self._conn
+
+    def get(self, key):
+        """Devuelve el valor almacenado o None si no existe o expiró."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT payload, created FROM entries WHERE key = ?", (key,)).fetchone()
+
+            if row and self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                conn.commit()
+                row = None
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+
+        return json.loads(zlib.decompress(row[0]))
+
+    def set(self, key, value):
+        """Almacena el valor y expulsa las entradas menos usadas si se supera el límite."""
+        payload = zlib.compress(json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        if len(payload) > self.max_bytes:
+            return
+
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, payload, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload), now, now)
+            )
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.evictions += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM entries")
+            conn.commit()
+
+    def stats(self):
+        """Contadores de uso de la caché."""
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+
+analysis_cache = DiskCache(CACHE_PATH)
+
+
+class MemoryCache:
+    """
+    Caché LRU en memoria acotada a max_entries. Con `backing` (un DiskCache),
+    lo que no está en memoria se busca en disco y cada valor se guarda en ambas.
+    Los valores se devuelven sin copiar: quien los modifique debe copiarlos.
+    """
+
+    def __init__(self, max_entries, backing=None):
+        self.max_entries = max_entries
+        self.backing = backing
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        value = self.backing.get(key) if self.backing else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value)
+        return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+        if self.backing:
+            self.backing.set(key, value)
+
+    def _store(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.backing:
+            self.backing.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+
+extraction_cache = MemoryCache(
+    EXTRACTION_CACHE_SIZE, DiskCache(EXTRACTION_CACHE_PATH) if EXTRACTION_CACHE_PATH else None
+)
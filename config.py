@@ -0,0 +1,9 @@
+import os
+from dotenv import load_dotenv
+
+# Se carga el .env una sola vez, antes de que los módulos lean su configuración.
+load_dotenv()
+
+def env(name, default=None):
+    """Valor de configuración desde el entorno o el archivo .env."""
+    return os.getenv(name, default)
@@ -0,0 +1,214 @@
+"""
+Detección de documentos duplicados entre lotes.
+
+- Exactos: mismo SHA-256 de los bytes (el handle del spool). Se reutiliza la
+  extracción previa sin llamar a Azure.
+- Similares: SimHash de 64 bits sobre shingles de 3 palabras del `content`
+  (p. ej. el mismo documento escaneado de nuevo). El índice guarda el hash
+  partido en 4 bandas de 16 bits: dos hashes a distancia de Hamming <= 3
+  coinciden en al menos una banda, así la búsqueda solo compara candidatos.
+
+El índice es persistente (SQLite) y guarda la última extracción revisada de
+cada documento, de modo que un duplicado hereda también las correcciones.
+"""
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from config import env
+from document_utils import normalize_for_classification, validate_document
+
+DEDUP_PATH = env("DEDUP_PATH", os.path.join(".smartdoc_cache", "dedup.sqlite"))
+SIMHASH_MAX_DISTANCE = int(env("SIMHASH_MAX_DISTANCE", "3"))
+SHINGLE_SIZE = 3
+MIN_SHINGLES = 8
+BANDS = 4
+BAND_BITS = 64 // BANDS
+
+WORD_PATTERN = re.compile(r"[A-Z0-9]+")
+
+# Campo que identifica al documento: si difiere, no es un duplicado aunque el texto se parezca.
+IDENTITY_FIELDS = {
+    "cedula": "numero_identificacion",
+    "acta_seguro": "numero_poliza",
+    "contrato": "numero_contrato",
+}
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Conjunto de secuencias de `size` palabras normalizadas (sin tildes ni mayúsculas)."""
+    words = WORD_PATTERN.findall(normalize_for_classification(text))
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+def simhash(text):
+    """SimHash de 64 bits del texto, o None si es demasiado corto para compararlo."""
+    features = shingles(text)
+    if len(features) < MIN_SHINGLES:
+        return None
+
+    weights = [0] * 64
+    for feature in features:
+        h = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+        for bit in range(64):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+def hamming_distance(a, b):
+    return bin(a ^ b).count("1")
+
+def _signed(value):
+    """SQLite guarda enteros de 64 bits con signo."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+def _unsigned(value):
+    return value & ((1 << 64) - 1) if value is not None else None
+
+def _bands(fingerprint):
+    mask = (1 << BAND_BITS) - 1
+    return [(band, fingerprint >> (band * BAND_BITS) & mask) for band in range(BANDS)]
+
+def _identity_matches(doc, prior):
+    """
+    Un documento similar solo es el mismo si ambos tienen el campo de
+    identidad y coincide: plantillas iguales de personas distintas se parecen
+    tanto como dos escaneos del mismo documento.
+    """
+    field_name = IDENTITY_FIELDS.get(doc["tipo"])
+    if not field_name:
+        return True
+    current = (doc["extraccion"].get(field_name) or {}).get("value")
+    previous = (prior["extraccion"].get(field_name) or {}).get("value")
+    return bool(current) and current == previous
+
+
+class DedupIndex:
+    """Índice persistente de documentos ya procesados por hash exacto y SimHash."""
+
+    def __init__(self, path, max_distance=SIMHASH_MAX_DISTANCE):
+        self.path = path
+        self.max_distance = max_distance
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " handle TEXT PRIMARY KEY, file_name TEXT NOT NULL, tipo TEXT NOT NULL,"
+                " confianza REAL, simhash INTEGER, extraccion TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, value INTEGER NOT NULL, handle TEXT NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, value)")
+        return self._conn
+
+    @staticmethod
+    def _row_to_prior(row):
+        handle, file_name, tipo, confianza, fingerprint, extraccion = row
+        return {"handle": handle, "file_name": file_name, "tipo": tipo, "confianza": confianza,
+                "simhash": _unsigned(fingerprint), "extraccion": json.loads(extraccion)}
+
+    def find_exact(self, handle):
+        """Documento previo con los mismos bytes, o None."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT handle, file_name, tipo, confianza, simhash, extraccion FROM documents WHERE handle = ?",
+                (handle,)
+            ).fetchone()
+        return self._row_to_prior(row) if row else None
+
+    def find_similar(self, doc, fingerprint):
+        """Documento previo del mismo tipo a distancia <= max_distance, o None."""
+        if fingerprint is None or doc["tipo"] == "desconocido":
+            return None
+
+        with self._lock:
+            conn = self._connection()
+            candidates = set()
+            for band, value in _bands(fingerprint):
+                candidates.update(h for h, in conn.execute(
+                    "SELECT handle FROM bands WHERE band = ? AND value = ?", (band, value)
+                ))
+            candidates.discard(doc.get("handle"))
+            rows = [
+                conn.execute(
+                    "SELECT handle, file_name, tipo, confianza, simhash, extraccion FROM documents"
+                    " WHERE handle = ? AND tipo = ?", (handle, doc["tipo"])
+                ).fetchone()
+                for handle in candidates
+            ]
+
+        best = None
+        for row in filter(None, rows):
+            prior = self._row_to_prior(row)
+            distance = hamming_distance(fingerprint, prior["simhash"])
+            if distance <= self.max_distance and _identity_matches(doc, prior):
+                if best is None or distance < best[0]:
+                    best = (distance, prior)
+        return best and {**best[1], "distancia": best[0]}
+
+    def remember(self, doc, fingerprint=None):
+        """Agrega o actualiza el documento en el índice."""
+        with self._lock:
+            conn = self._connection()
+            if fingerprint is None:
+                row = conn.execute("SELECT simhash FROM documents WHERE handle = ?", (doc["handle"],)).fetchone()
+                fingerprint = _unsigned(row[0]) if row else None
+            conn.execute(
+                "INSERT OR REPLACE INTO documents (handle, file_name, tipo, confianza, simhash, extraccion, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (doc["handle"], doc["file_name"], doc["tipo"], doc.get("confianza"),
+                 _signed(fingerprint) if fingerprint is not None else None,
+                 json.dumps(doc["extraccion"], ensure_ascii=False), time.time())
+            )
+            conn.execute("DELETE FROM bands WHERE handle = ?", (doc["handle"],))
+            if fingerprint is not None:
+                conn.executemany(
+                    "INSERT INTO bands (band, value, handle) VALUES (?, ?, ?)",
+                    [(band, value, doc["handle"]) for band, value in _bands(fingerprint)]
+                )
+            conn.commit()
+
+    def update_extraccion(self, doc):
+        """Guarda las correcciones de revisión de un documento ya indexado."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE documents SET extraccion = ?, updated = ? WHERE handle = ?",
+                (json.dumps(doc["extraccion"], ensure_ascii=False), time.time(), doc["handle"])
+            )
+            conn.commit()
+
+
+def reuse_document(file_name, handle, prior, kind):
+    """
+    Documento nuevo que hereda la clasificación y la extracción del previo.
+    `kind` es "exacto" o "similar"; queda en doc["duplicado"] junto al archivo original.
+    """
+    doc = {
+        "file_name": file_name,
+        "tipo": prior["tipo"],
+        "confianza": prior["confianza"],
+        "extraccion": copy.deepcopy(prior["extraccion"]),
+        "estado": "Revisar",
+        "validacion": {},
+        "handle": handle,
+        "duplicado": {"tipo": kind, "file_name": prior["file_name"], "handle": prior["handle"]},
+    }
+    if "distancia" in prior:
+        doc["duplicado"]["distancia"] = prior["distancia"]
+    return validate_document(doc)
+
+
+dedup_index = DedupIndex(DEDUP_PATH)
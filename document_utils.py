@@ -1,32 +1,106 @@
-import base64
 import re
 import io
-import pandas as pd
-import streamlit as st 
+import unicodedata
+from functools import lru_cache
+from extractors import EXTRACTION_SPECS
 
-def display_pdf(file_bytes):
-    """Muestra un PDF en un iframe de HTML usando base64."""
-    base64_pdf = base64.b64encode(file_bytes).decode('utf-8')
-    pdf_display = f'<iframe src="data:application/pdf;base64,{base64_pdf}#view=fitH" width="100%" height="500"></iframe>'
-    st.markdown(pdf_display, unsafe_allow_html=True)
+CLASSIFIER_WINDOW = 3000
+CLASSIFIER_THRESHOLD = 0.45
 
-def reset_state():
-    st.session_state.processed_data = None
-    st.session_state.processing_complete = False
+# Palabras clave por tipo (sin tildes, en mayúscula) y su peso en el puntaje.
+DOCUMENT_KEYWORDS = {
+    "cedula": {
+        "REPUBLICA": 1, "COLOMBIA": 1, "IDENTIFICACION": 1, "PERSONAL": 1, "CEDULA": 2, "CIUDADANIA": 2,
+        "APELLIDOS": 2, "NOMBRES": 2, "NACIMIENTO": 2, "ESTATURA": 3, "RH": 2, "SEXO": 2,
+        "EXPEDICION": 2, "INDICE": 2, "DERECHO": 1,
+    },
+    "acta_seguro": {
+        "CERTIFICADO": 2, "COBERTURA": 2, "ACTA": 1, "SEGURO": 2, "POLIZA": 3, "RAMO": 2,
+        "TOMADOR": 3, "ASEGURADO": 3, "VIGENCIA": 2, "RESPONSABILIDAD": 1, "EXTRACONTRACTUAL": 2,
+        "HURTO": 2, "ASISTENCIA": 1, "JURIDICA": 1,
+    },
+    "contrato": {
+        "CONTRATO": 3, "PRESTACION": 2, "SERVICIOS": 1, "PROFESIONALES": 2, "CONTRATANTE": 3,
+        "CONTRATISTA": 3, "SUSCRITOS": 1, "CLAUSULA": 3, "OBJETO": 2, "DURACION": 1, "VALOR": 1,
+        "PARTES": 1, "FIRMA": 1,
+    },
+}
 
-def classify_document(text):
-    """Clasifica documentos según expresiones clave."""
-    patterns = {
-        "cedula": "REPÚBLICA DE COLOMBIA IDENTIFICACIÓN PERSONAL CÉDULA DE CIUDADANÍA",
-        "acta_seguro": "CERTIFICADO DE COBERTURA Y ACTA DE SEGURO",
-        "contrato": "CONTRATO DE PRESTACIÓN DE SERVICIOS PROFESIONALES",
+# Frases que identifican el tipo por sí solas.
+DOCUMENT_SIGNATURES = {
+    "cedula": "REPUBLICA DE COLOMBIA IDENTIFICACION PERSONAL CEDULA DE CIUDADANIA",
+    "acta_seguro": "CERTIFICADO DE COBERTURA Y ACTA DE SEGURO",
+    "contrato": "CONTRATO DE PRESTACION DE SERVICIOS PROFESIONALES",
+}
+
+# Índices por palabra: una sola pasada sobre el texto puntúa todos los tipos,
+# sin importar cuántos tipos haya registrados.
+KEYWORD_INDEX = {}
+for _label, _keywords in DOCUMENT_KEYWORDS.items():
+    for _word, _weight in _keywords.items():
+        KEYWORD_INDEX.setdefault(_word, []).append((_label, _weight))
+SIGNATURE_INDEX = {}
+for _label, _phrase in DOCUMENT_SIGNATURES.items():
+    _tokens = tuple(_phrase.split())
+    SIGNATURE_INDEX.setdefault(_tokens[0], []).append((_label, _tokens))
+KEYWORD_TOTALS = {label: sum(keywords.values()) for label, keywords in DOCUMENT_KEYWORDS.items()}
+
+TOKEN_PATTERN = re.compile(r"[A-Z]+")
+
+def normalize_for_classification(text):
+    """Mayúsculas y sin tildes, para tolerar diferencias de acentuación del OCR."""
+    text = unicodedata.normalize("NFKD", text.upper())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def score_document(text):
+    """
+    Puntaje por tipo entre 0 y 1: peso de las palabras clave encontradas sobre
+    el peso total del tipo. Si aparece la frase característica del tipo, vale 1.
+    """
+    tokens = TOKEN_PATTERN.findall(normalize_for_classification(text))
+    found = {}
+    seen = set()
+    signatures = set()
+
+    for i, token in enumerate(tokens):
+        for label, phrase in SIGNATURE_INDEX.get(token, ()):
+            if tuple(tokens[i:i + len(phrase)]) == phrase:
+                signatures.add(label)
+        if token in seen:
+            continue
+        seen.add(token)
+        for label, weight in KEYWORD_INDEX.get(token, ()):
+            found[label] = found.get(label, 0) + weight
+
+    return {
+        label: 1.0 if label in signatures else found[label] / KEYWORD_TOTALS[label]
+        for label in DOCUMENT_KEYWORDS if label in found or label in signatures
     }
-    for label, pattern in patterns.items():
-        if pattern in text:
-            return label
-    return "desconocido"
 
+def classify_document_scored(text, window=CLASSIFIER_WINDOW):
+    """
+    Clasifica el documento y devuelve (tipo, confianza).
+    Primero revisa solo los primeros `window` caracteres; si la confianza no
+    alcanza el umbral, puntúa el texto completo.
+    """
+    scores = score_document(text[:window])
+    if len(text) > window and max(scores.values(), default=0) < CLASSIFIER_THRESHOLD:
+        scores = score_document(text)
+
+    if not scores:
+        return "desconocido", 0.0
 
+    label = max(scores, key=scores.get)
+    if scores[label] < CLASSIFIER_THRESHOLD:
+        return "desconocido", round(1 - scores[label], 2)
+    return label, round(scores[label], 2)
+
+def classify_document(text):
+    """Clasifica documentos según palabras clave."""
+    return classify_document_scored(text)[0]
+
+
+@lru_cache(maxsize=None)
 def get_field_type(key):
     """Determina el tipo de dato esperado basado en la clave. Usa listas estrictas para evitar errores de substring."""
     key_lower = key.lower()
@@ -61,166 +135,249 @@ def get_field_type(key):
         
     return "text_long"
 
-def sanitize_value(key, value):
-    """Limpia el valor ingresado según el tipo de campo."""
-    dtype = get_field_type(key)
-    val_str = str(value).strip() 
+CHAR_PATTERN = re.compile(r'[^FM]')
+BLOOD_TYPE_PATTERN = re.compile(r'(A|B|AB|O)[+-]')
+HEIGHT_PATTERN = re.compile(r'[^0-9\.]')
+TEXT_STRICT_PATTERN = re.compile(r'[^a-zA-Z0-9\sñÑáéíóúÁÉÍÓÚ+,.()]')
+NON_DIGIT_PATTERN = re.compile(r'[^\d]')
+LETTER_PATTERN = re.compile(r'[a-zA-Z]')
+CURRENCY_CHARS_PATTERN = re.compile(r'[^\d\.,]')
+DIGIT_PATTERN = re.compile(r'\d')
+DATE_SEPARATOR_PATTERN = re.compile(r'[\.\-]')
+REPEATED_SLASH_PATTERN = re.compile(r'/+')
+TRAILING_PUNCTUATION_PATTERN = re.compile(r'[\,\;]$')
+PERCENTAGE_PATTERN = re.compile(r'(\d+.*%)|(\d+.*VALOR\s*COMERCIAL)', re.IGNORECASE)
+DATE_TIME_PATTERN = re.compile(r'^\d{2}/\d{2}/\d{4}(\s\d{2}:\d{2})?$')
 
-    if dtype == "char":        
-        val_str = val_str.strip().upper()                 
-        val_str = re.sub(r'[^FM]', '', val_str)                 
-        return val_str[:1]
 
-    if dtype == "char2":        
-        val_str = val_str.strip().upper()                         
-        match = re.fullmatch(r'^(A|B|AB|O)[+-]$', val_str)
-        
-        if match:            
-            return val_str
-        else:            
-            return ""
-    if dtype == "numeric_height":
-        val_str = re.sub(r'[^0-9\.]', '', val_str)  
-        return val_str[:3]
-    
-                
-    
-    if dtype == "text_strict":
-        val_str = re.sub(r'[^a-zA-Z0-9\sñÑáéíóúÁÉÍÓÚ+,.()]', '', val_str)
-        return val_str[:50]
-    
-    if dtype == "text_long":                
-        val_str = ' '.join(val_str.split())
-        return val_str
-        
-    if dtype == "numeric_strict": 
-        return re.sub(r'[^\d]', '', val_str)
-    
-    if dtype == "currency": 
-        if re.search(r'[a-zA-Z]', val_str):
-            return "" 
-        val_str = re.sub(r'[^\d\.,]', '', val_str) 
-        pure_digits = re.sub(r'[^\d]', '', val_str)
-
-        if not pure_digits:
-            return ""
-        
-        try: 
-            formatted_number = "{:,}".format(int(pure_digits)).replace(",", ".")
-            return f"${formatted_number}"
-            
-        except ValueError:
-            return ""
-            
-    if dtype == "percentage":
-        return val_str.upper()
-    
-    if dtype == "date":        
-        val_str = re.sub(r'[\.\-]', '/', val_str)         
-        val_str = re.sub(r'/+', '/', val_str)
-        return re.sub(r'[\,\;]$', '', val_str).strip()
-            
+def _sanitize_char(val_str):
+    return CHAR_PATTERN.sub('', val_str.upper())[:1]
+
+def _sanitize_char2(val_str):
+    val_str = val_str.upper()
+    return val_str if BLOOD_TYPE_PATTERN.fullmatch(val_str) else ""
+
+def _sanitize_numeric_height(val_str):
+    return HEIGHT_PATTERN.sub('', val_str)[:3]
+
+def _sanitize_text_strict(val_str):
+    return TEXT_STRICT_PATTERN.sub('', val_str)[:50]
+
+def _sanitize_text_long(val_str):
+    return ' '.join(val_str.split())
+
+def _sanitize_numeric_strict(val_str):
+    return NON_DIGIT_PATTERN.sub('', val_str)
+
+def _sanitize_currency(val_str):
+    if LETTER_PATTERN.search(val_str):
+        return ""
+    pure_digits = NON_DIGIT_PATTERN.sub('', CURRENCY_CHARS_PATTERN.sub('', val_str))
+    if not pure_digits:
+        return ""
+    return "${:,}".format(int(pure_digits)).replace(",", ".")
+
+def _sanitize_percentage(val_str):
+    return val_str.upper()
+
+def _sanitize_date(val_str):
+    val_str = REPEATED_SLASH_PATTERN.sub('/', DATE_SEPARATOR_PATTERN.sub('/', val_str))
+    return TRAILING_PUNCTUATION_PATTERN.sub('', val_str).strip()
+
+def _keep(val_str):
     return val_str
 
+# Limpieza por tipo de dato; reciben el valor ya convertido a str y sin espacios extremos.
+SANITIZERS = {
+    "char": _sanitize_char,
+    "char2": _sanitize_char2,
+    "numeric_height": _sanitize_numeric_height,
+    "text_strict": _sanitize_text_strict,
+    "text_long": _sanitize_text_long,
+    "numeric_strict": _sanitize_numeric_strict,
+    "currency": _sanitize_currency,
+    "percentage": _sanitize_percentage,
+    "date": _sanitize_date,
+}
+
+
+def _validate_text_strict(val_str):
+    if len(val_str) > 50:
+        return f"El texto excede el límite de 50 caracteres (actual: {len(val_str)})"
+
+def _validate_numeric_strict(val_str):
+    if not val_str.isdigit() or len(val_str) > 10:
+        return "Solo debe contener números (max. 10 dígitos)"
+
+def _validate_currency(val_str):
+    if not DIGIT_PATTERN.search(val_str):
+        return "El valor de moneda es inválido"
+
+def _validate_percentage(val_str):
+    if not PERCENTAGE_PATTERN.search(val_str):
+        return "Debe indicar porcentaje (ej: 100% VALOR COMERCIAL)"
+
+def _validate_date(val_str):
+    if not DATE_TIME_PATTERN.match(val_str):
+        return "Formato de fecha/hora inválido. Requerido: dd/mm/aaaa o dd/mm/aaaa hh:mm"
+
+def _no_check(val_str):
+    return None
+
+# Validación por tipo de dato; reciben el valor no vacío, como str y sin espacios extremos.
+VALIDATORS = {
+    "text_strict": _validate_text_strict,
+    "numeric_strict": _validate_numeric_strict,
+    "currency": _validate_currency,
+    "percentage": _validate_percentage,
+    "date": _validate_date,
+}
+
+
+def sanitize_value(key, value):
+    """Limpia el valor ingresado según el tipo de campo."""
+    return SANITIZERS.get(get_field_type(key), _keep)(str(value).strip())
+
 def validate_field_format(key, value):
     """Valida formato retornando mensaje de error si falla."""
     if not value or str(value).strip() == "":
         return "⚠️ Campo vacío"
+    return VALIDATORS.get(get_field_type(key), _no_check)(str(value).strip())
 
-    val_str = str(value).strip()
-    dtype = get_field_type(key)
-        
-    if dtype == "text_strict":
-        if len(val_str) > 50:
-            return f"El texto excede el límite de 50 caracteres (actual: {len(val_str)})"        
-            
-    if dtype == "numeric_strict":
-        if not val_str.isdigit() or len(val_str) > 10:
-            return "Solo debe contener números (max. 10 dígitos)"
-            
-    if dtype == "currency":
-        if not re.search(r'\d', val_str):
-            return "El valor de moneda es inválido"
 
-    if dtype == "percentage":        
-        if not re.search(r'(\d+.*%)|(\d+.*VALOR\s*COMERCIAL)', val_str, re.IGNORECASE):
-            return "Debe indicar porcentaje (ej: 100% VALOR COMERCIAL)"
-            
-    if dtype == "date": 
-        date_time_pattern = r'^\d{2}/\d{2}/\d{4}(\s\d{2}:\d{2})?$'
-        if not re.match(date_time_pattern, val_str):
-            return "Formato de fecha/hora inválido. Requerido: dd/mm/aaaa o dd/mm/aaaa hh:mm"
+def _like(values, result):
+    """Devuelve `result` con el mismo tipo de contenedor que `values` (lista o pandas.Series)."""
+    if hasattr(values, "index") and hasattr(values, "to_numpy"):
+        return type(values)(result, index=values.index, name=getattr(values, "name", None))
+    return result
 
-    return None
+def sanitize_column(key, values):
+    """
+    Versión por lotes de sanitize_value para una columna de valores del campo `key`
+    (lista, tupla o pandas.Series). El tipo del campo se resuelve una vez y cada
+    valor distinto se limpia una sola vez.
+    """
+    sanitize = SANITIZERS.get(get_field_type(key), _keep)
+    seen = {}
+    result = []
+    for value in values:
+        val_str = str(value).strip()
+        clean = seen.get(val_str)
+        if clean is None:
+            clean = seen[val_str] = sanitize(val_str)
+        result.append(clean)
+    return _like(values, result)
 
+def validate_column(key, values):
+    """
+    Versión por lotes de validate_field_format: mensaje de error (o None) por
+    cada valor de la columna, en el mismo tipo de contenedor recibido.
+    """
+    validate = VALIDATORS.get(get_field_type(key), _no_check)
+    seen = {}
+    result = []
+    for value in values:
+        if not value or str(value).strip() == "":
+            result.append("⚠️ Campo vacío")
+            continue
+        val_str = str(value).strip()
+        if val_str not in seen:
+            seen[val_str] = validate(val_str)
+        result.append(seen[val_str])
+    return _like(values, result)
 
-def revalidate_document(doc_index):
-    """Re-ejecuta validaciones en todo el documento."""
-    doc = st.session_state.processed_data[doc_index]
-    new_validation = []
-    
-    for key, data in doc["extraccion"].items():
-        field_value = data.get("value", "")
-        error_msg = validate_field_format(key, field_value)
-        
-        if error_msg:
-            readable_key = key.replace('_', ' ').title()
-            new_validation.append(f"{readable_key}: {error_msg}")
 
-    doc["validacion"] = new_validation
-    doc["estado"] = "Revisar" if new_validation else "Validado"
-    st.session_state.processed_data[doc_index] = doc
+def validate_field(doc, key):
+    """
+    Revalida un solo campo. `doc["validacion"]` guarda el error vigente de cada
+    campo, así que el estado del documento se actualiza sin recorrer los demás.
+    """
+    error_msg = validate_field_format(key, doc["extraccion"].get(key, {}).get("value", ""))
 
-def update_extraction_value(doc_index, field_key):
-    """Callback ejecutado cuando el usuario cambia un input."""
-    widget_key = f"doc{doc_index}-{field_key}"
-    
-    if widget_key in st.session_state:
-        raw_value = st.session_state[widget_key]
-                
-        clean_value = sanitize_value(field_key, raw_value)
-                
-        st.session_state.processed_data[doc_index]['extraccion'][field_key]['value'] = clean_value
-                
-        if raw_value != clean_value:
-            st.session_state[widget_key] = clean_value
-                    
-        revalidate_document(doc_index)
+    if error_msg:
+        doc["validacion"][key] = error_msg
+    else:
+        doc["validacion"].pop(key, None)
 
+    doc["estado"] = "Revisar" if doc["validacion"] else "Validado"
+    return doc
 
+def validate_document(doc):
+    """Re-ejecuta validaciones en todo el documento y actualiza su estado."""
+    doc["validacion"] = {}
+    for key in doc["extraccion"]:
+        validate_field(doc, key)
 
+    doc["estado"] = "Revisar" if doc["validacion"] else "Validado"
+    return doc
 
-def generate_excel(processed_data):
-    """Genera Excel basado en los datos actuales de session_state."""
-    output = io.BytesIO()
-    
-    grouped_data = {
-        "Cédulas": [d for d in processed_data if d['tipo'] == 'cedula'],
-        "Actas de Seguro": [d for d in processed_data if d['tipo'] == 'acta_seguro'],
-        "Contratos": [d for d in processed_data if d['tipo'] == 'contrato'],
-        "Otros": [d for d in processed_data if d['tipo'] == 'desconocido']
-    }
 
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        for sheet_name, data_list in grouped_data.items():
-            if not data_list:
-                continue 
-            
-            rows = []
-            for d in data_list:                
-                row = {"Archivo": d["file_name"], "Estado Validación": d["estado"]}                                
-                for k, v in d["extraccion"].items():
-                    row[k] = v.get("value")
-                    
-                rows.append(row)
-            
-            df = pd.DataFrame(rows)
-            
-            df.to_excel(writer, index=False, sheet_name=sheet_name)
-            
-            worksheet = writer.sheets[sheet_name]
-            for i, col in enumerate(df.columns):                
-                max_len = max(df[col].astype(str).map(len).max(), len(col)) + 2
-                worksheet.set_column(i, i, max_len)
+EXCEL_SHEETS = {
+    "cedula": "Cédulas",
+    "acta_seguro": "Actas de Seguro",
+    "contrato": "Contratos",
+    "desconocido": "Otros",
+}
+EXCEL_FIXED_COLUMNS = ["Archivo", "Estado Validación"]
+
+def excel_columns(document_type):
+    """Columnas de la hoja de un tipo, en el orden de campos de su extractor."""
+    spec = EXTRACTION_SPECS.get(document_type)
+    return EXCEL_FIXED_COLUMNS + [f.name for f in spec.fields] if spec else list(EXCEL_FIXED_COLUMNS)
+
+def write_excel(documents, output):
+    """
+    Escribe el Excel consolidado fila por fila con xlsxwriter en modo
+    constant_memory, así la memoria no crece con la cantidad de documentos.
+    `documents` puede ser una lista o un generador de dicts o de DocumentRecord;
+    `output` una ruta o un archivo.
+    """
+    import xlsxwriter
 
-    return output.getvalue()
\ No newline at end of file
+    workbook = xlsxwriter.Workbook(output, {"constant_memory": True})
+    header_format = workbook.add_format({"bold": True, "border": 1, "align": "center", "valign": "top"})
+    sheets = {}
+
+    def open_sheet(document_type):
+        columns = excel_columns(document_type)
+        worksheet = workbook.add_worksheet(EXCEL_SHEETS[document_type])
+        worksheet.write_row(0, 0, columns, header_format)
+        sheets[document_type] = [worksheet, columns, 1, [len(c) for c in columns]]
+        return sheets[document_type]
+
+    if isinstance(documents, list):
+        present = {d.tipo if hasattr(d, "excel_row") else d["tipo"] for d in documents}
+        for document_type in EXCEL_SHEETS:
+            if document_type in present:
+                open_sheet(document_type)
+
+    for d in documents:
+        tipo = d.tipo if hasattr(d, "excel_row") else d["tipo"]
+        if tipo not in EXCEL_SHEETS:
+            continue
+        sheet = sheets.get(tipo) or open_sheet(tipo)
+        worksheet, columns, row, widths = sheet
+
+        if hasattr(d, "excel_row"):
+            values = d.excel_row()
+        else:
+            values = [d["file_name"], d["estado"]]
+            values += [d["extraccion"].get(k, {}).get("value") for k in columns[len(EXCEL_FIXED_COLUMNS):]]
+        for col, value in enumerate(values):
+            if value is None:
+                continue
+            worksheet.write(row, col, value)
+            widths[col] = max(widths[col], len(str(value)))
+        sheet[2] = row + 1
+
+    for worksheet, columns, row, widths in sheets.values():
+        for i, width in enumerate(widths):
+            worksheet.set_column(i, i, width + 2)
+
+    workbook.close()
+
+def generate_excel(processed_data):
+    """Genera Excel consolidado a partir de la lista de documentos procesados."""
+    output = io.BytesIO()
+    write_excel(processed_data, output)
+    return output.getvalue()
@@ -1,4 +1,25 @@
+import copy
+import hashlib
+import marshal
 import re
+import types
+from bisect import bisect_right
+from collections import namedtuple
+from cache import extraction_cache
+
+REGEX_FLAGS = re.DOTALL | re.IGNORECASE
+
+# Región de búsqueda alrededor de una etiqueta: líneas siguientes a la del anclaje
+# y margen mínimo entre el fin del match y el fin de la región para aceptarlo.
+LAYOUT_WINDOW_LINES = 12
+LAYOUT_MARGIN_CHARS = 64
+
+# Caracteres que IGNORECASE equipara con letras de los anclajes (i, k, s) sin ser
+# iguales a ellas. Si aparecen en el texto no se puede ubicar el anclaje con str.find.
+CASE_VARIANTS = ("\u0130", "\u0131", "\u017f", "\u212a")
+
+FieldSpec = namedtuple("FieldSpec", ["name", "pattern", "cleaning_func", "anchor"])
+DocumentSpec = namedtuple("DocumentSpec", ["normalize", "fields", "joiner"])
 
 def clean_number(text):
     """Deja solo dígitos. Ej: '1.234.567' -> '1234567'"""
@@ -16,76 +37,315 @@ def clean_text_basic(text):
     return ' '.join(text.split())
 
 
-def find_by_regex(text, pattern, cleaning_func=None):
+def literal_prefix(pattern):
+    """Prefijo literal de un patrón: todo match del patrón comienza con este texto."""
+    prefix = []
+    for ch in pattern:
+        if ch in "\\.^$|()[]{}":
+            break
+        if ch in "?*+":
+            if prefix:
+                prefix.pop()
+            break
+        prefix.append(ch)
+    return "".join(prefix)
+
+def field(name, pattern, cleaning_func=None):
+    """Define un campo: patrón compilado una sola vez y su anclaje literal."""
+    return FieldSpec(name, re.compile(pattern, REGEX_FLAGS), cleaning_func, literal_prefix(pattern))
+
+def document_spec(normalize, *fields, joiner="\n"):
     """
-    Busca patrón y aplica función de limpieza si se especifica.
-    """        
-    match = re.search(pattern, text, re.DOTALL | re.IGNORECASE)
+    Agrupa los campos de un tipo, con los anclajes normalizados igual que el texto.
+    `joiner` es el separador que deja la normalización entre dos líneas.
+    """
+    return DocumentSpec(normalize, tuple(
+        spec._replace(anchor=normalize(spec.anchor).rstrip() if spec.anchor[:1].strip() else "")
+        for spec in fields
+    ), joiner)
+
+
+def match_value(match, cleaning_func=None):
+    """Valor del primer grupo de un match, limpio."""
     val = match.group(1).strip() if match and match.group(1) else None
-    
+
     if val and cleaning_func:
         return cleaning_func(val)
     return val
 
+def find_by_regex(text, pattern, cleaning_func=None, pos=0):
+    """
+    Busca patrón y aplica función de limpieza si se especifica.
+    """
+    if isinstance(pattern, str):
+        pattern = re.compile(pattern, REGEX_FLAGS)
+    return match_value(pattern.search(text, pos), cleaning_func)
+
+def anchors_usable(text):
+    return not any(ch in text for ch in CASE_VARIANTS)
+
+def search_field(text, f, use_anchors):
+    """Primer match del campo, evaluando el patrón desde la primera aparición de su anclaje."""
+    pos = text.find(f.anchor) if use_anchors and f.anchor else 0
+    return f.pattern.search(text, pos) if pos >= 0 else None
+
+def extract_fields(spec, text):
+    """
+    Normaliza el texto una sola vez y extrae todos los campos del tipo.
+    Cada patrón se evalúa desde la primera aparición de su anclaje, así que
+    los campos ausentes no recorren el documento con la expresión regular.
+    """
+    text = spec.normalize(text)
+    use_anchors = anchors_usable(text)
+    return {f.name: match_value(search_field(text, f, use_anchors), f.cleaning_func) for f in spec.fields}
+
+
+class LayoutText:
+    """
+    Texto normalizado reconstruido desde las líneas de `pages` de Azure,
+    con el inicio de cada línea para ubicar página y polígono de un match.
+    """
+
+    def __init__(self, spec, azure_json):
+        self.lines = []
+        self.starts = []
+        parts = []
+        pos = 0
+        for page in azure_json.get("pages") or []:
+            for line in page.get("lines") or []:
+                line_text = spec.normalize(line.get("content", ""))
+                if spec.joiner == " " and not line_text:
+                    continue
+                self.lines.append((page.get("page_number"), line))
+                self.starts.append(pos)
+                parts.append(line_text)
+                pos += len(line_text) + len(spec.joiner)
+        self.text = spec.joiner.join(parts)
+
+    def line_index(self, pos):
+        return bisect_right(self.starts, pos) - 1
+
+    def region_end(self, pos):
+        """Fin de la región de búsqueda: LAYOUT_WINDOW_LINES líneas después de la línea de pos."""
+        last = self.line_index(pos) + LAYOUT_WINDOW_LINES
+        return self.starts[last] if last < len(self.starts) else len(self.text)
+
+    def location(self, pos):
+        page_number, line = self.lines[self.line_index(pos)]
+        return {"pagina": page_number, "poligono": line.get("polygon")}
+
+def key_value_locations(spec, azure_json):
+    """Ubicación de los valores de los pares clave-valor de Azure, indexados por etiqueta normalizada."""
+    locations = {}
+    for pair in azure_json.get("key_value_pairs") or []:
+        key, value = pair.get("key") or {}, pair.get("value") or {}
+        regions = value.get("bounding_regions") or key.get("bounding_regions")
+        if key.get("content") and regions:
+            label = spec.normalize(key["content"]).rstrip(": ")
+            locations.setdefault(label, {"pagina": regions[0].get("page_number"), "poligono": regions[0].get("polygon")})
+    return locations
+
+def search_layout_field(layout, f, pos):
+    """
+    Busca el campo solo en la región cercana a su etiqueta (que empieza en pos).
+    Si el match queda demasiado cerca del borde de la región, repite la búsqueda sin límite.
+    """
+    end = layout.region_end(pos)
+    match = f.pattern.search(layout.text, pos, end)
+    if match and (end == len(layout.text) or match.end() + LAYOUT_MARGIN_CHARS <= end):
+        return match
+    return f.pattern.search(layout.text, pos)
+
+def extract_fields_with_layout(spec, azure_json):
+    """
+    Extrae los campos usando las líneas, páginas y pares clave-valor de Azure.
+    Devuelve {campo: (valor, ubicacion)}; los campos sin etiqueta en el layout
+    se buscan con la expresión regular sobre `content` completo.
+    """
+    layout = LayoutText(spec, azure_json)
+    if not layout.lines or not anchors_usable(layout.text):
+        return {name: (value, None) for name, value in extract_fields(spec, azure_json.get("content", "")).items()}
+
+    kv_locations = key_value_locations(spec, azure_json)
+    content_text = None
+    extracted = {}
+    for f in spec.fields:
+        pos = layout.text.find(f.anchor) if f.anchor else -1
+        if pos >= 0:
+            match = search_layout_field(layout, f, pos)
+            value = match_value(match, f.cleaning_func)
+            location = None
+            if value is not None:
+                location = kv_locations.get(f.anchor.rstrip(": ")) or layout.location(match.start(1))
+            extracted[f.name] = (value, location)
+            continue
+
+        if content_text is None:
+            content_text = spec.normalize(azure_json.get("content", ""))
+        match = search_field(content_text, f, anchors_usable(content_text))
+        extracted[f.name] = (match_value(match, f.cleaning_func), None)
+    return extracted
+
+
+EXTRACTION_SPECS = {
+    "cedula": document_spec(
+        lambda text: text.lower().upper(),
+        field("numero_identificacion", r"NÚMERO:\s*([\d\.]+)", clean_number),
+        field("apellidos", r"APELLIDOS:\s*(.+?)NOMBRES:", clean_text_basic),
+        field("nombres", r"NOMBRES:\s*(.+?)FECHA DE NACIMIENTO:", clean_text_basic),
+        field("fecha_nacimiento", r"FECHA DE NACIMIENTO:\s*(\d{2}-[A-Z]{3}-\d{4})"),
+        field("lugar_nacimiento", r"LUGAR DE NACIMIENTO:\s*(.+?)ESTATURA:", clean_text_basic),
+        field("estatura", r"ESTATURA:\s*([\d\.]+ M)", clean_number),
+        field("rh", r"RH:\s*([ABO]{1,2}[\+\-])", clean_text_basic),
+        field("sexo", r"SEXO:\s*([FM])", clean_text_basic),
+        field("fecha_expedicion", r"FECHA DE EXPEDICIÓN:\s*(\d{2}-[A-Z]{3}-\d{4})"),
+        field("lugar_expedicion", r"LUGAR DE EXPEDICIÓN:\s*(.+?)ÍNDICE"),
+    ),
+    "acta_seguro": document_spec(
+        lambda text: ' '.join(text.lower().upper().split()),
+        field("numero_poliza", r"NÚMERO DE PÓLIZA:\s*([A-Z0-9\-]+)", clean_number),
+        field("ramo", r"RAMO:\s*(.+?)\s*(?:[•·]\s*)?TOMADOR", clean_text_basic),
+        field("asegurado", r"TOMADOR\s*/\s*ASEGURADO:\s*([A-ZÁÉÍÓÚÜÑ\s\-]+?)\s*(?:[•·]\s*)?IDENTIFICACIÓN:", clean_text_basic),
+        field("identificacion", r"IDENTIFICACIÓN:\s*([C\.\sE\d\.]+)(?:\s*VIGENCIA)?", clean_number),
+        field("vigencia_inicio", r"FECHA DE INICIO:\s*(\d{1,2} DE [A-ZÁÉÍÓÚÜÑ]+ DE \d{4}.*?)(?:[•·]\s*)(?=\s*FECHA DE FIN)"),
+        field("vigencia_fin", r"FECHA DE FIN:\s*(\d{1,2} DE [A-ZÁÉÍÓÚÜÑ]+ DE \d{4}.*?)(?=\s*RESUMEN|4\.)"),
+        field("cobertura_rc_monto", r"RESPONSABILIDAD CIVIL EXTRACONTRACTUAL:\s*(.+?COP)", clean_currency),
+        field("cobertura_daños", r"PÉRDIDA TOTAL POR DAÑOS:\s*(.+?)3\.", clean_text_basic),
+        field("cobertura_hurto", r"PÉRDIDA TOTAL POR HURTO:\s*(.+?)4\.", clean_text_basic),
+        field("cobertura_asistencia", r"ASISTENCIA JURÍDICA:\s*(.+?)ESTADO", clean_text_basic),
+        field("estado_poliza", r"ESTADO DE LA PÓLIZA:\s*([A-Z]+)", clean_text_basic),
+        joiner=" ",
+    ),
+    "contrato": document_spec(
+        lambda text: ' '.join(text.lower().split()),
+        field("numero_contrato", r"profesionales no\.?\s*([\d\-]+)", clean_number),
+        field("contratante_nombre", r"por una parte,\s*(.+?)\s*s\.?a\.?s\.?,", clean_text_basic),
+        field("contratante_nit", r"nit\s*([\d\.\-]+)", clean_number),
+        field("contratista_nombre", r"por otra parte,\s*([a-záéíóúüñ\s]+),?\s*identificada", clean_text_basic),
+        field("contratista_identificacion", r"cédula de ciudadanía no\.?\s*([\d\.]+)", clean_number),
+        field("valor_contrato_monto", r"valor total.*?(\$[\d\.\,]+\s*cop)", clean_currency),
+        field("objeto_del_contrato_texto", r"cláusula primera\s*-\s*objeto:\s*(.*?)(?=cláusula segunda)", clean_text_basic),
+        field("duracion_inicio", r"contados a partir del ([0-9]{1,2} de [a-z]+ de \d{4})"),
+        field("duracion_fin", r"hasta el ([0-9]{1,2} de [a-z]+ de \d{4})"),
+        field("fecha_firma", r"a los ([0-9]{1,2} días del mes de [a-z]+ de \d{4})"),
+        joiner=" ",
+    ),
+}
+
 def extract_cedula(text):
-    text = text.upper()
-    return {
-        "numero_identificacion": find_by_regex(text, r"NÚMERO:\s*([\d\.]+)", clean_number),
-        "apellidos": find_by_regex(text, r"APELLIDOS:\s*(.+?)NOMBRES:", clean_text_basic),
-        "nombres": find_by_regex(text, r"NOMBRES:\s*(.+?)FECHA DE NACIMIENTO:", clean_text_basic),
-        "fecha_nacimiento": find_by_regex(text, r"FECHA DE NACIMIENTO:\s*(\d{2}-[A-Z]{3}-\d{4})"),
-        "lugar_nacimiento": find_by_regex(text, r"LUGAR DE NACIMIENTO:\s*(.+?)ESTATURA:", clean_text_basic),        
-        "estatura": find_by_regex(text, r"ESTATURA:\s*([\d\.]+ M)", clean_number),
-        "rh": find_by_regex(text, r"RH:\s*([ABO]{1,2}[\+\-])", clean_text_basic),
-        "sexo": find_by_regex(text, r"SEXO:\s*([FM])", clean_text_basic),
-        "fecha_expedicion": find_by_regex(text, r"FECHA DE EXPEDICIÓN:\s*(\d{2}-[A-Z]{3}-\d{4})"),
-        "lugar_expedicion": find_by_regex(text, r"LUGAR DE EXPEDICIÓN:\s*(.+?)ÍNDICE"),
-    }
+    return extract_fields(EXTRACTION_SPECS["cedula"], text)
 
 def extract_acta_seguro(text):
-    text = ' '.join(text.upper().split())  
-    
-    return {
-        "numero_poliza": find_by_regex(text, r"NÚMERO DE PÓLIZA:\s*([A-Z0-9\-]+)", clean_number),                
-        "ramo": find_by_regex(text, r"RAMO:\s*(.+?)\s*(?:[•·]\s*)?TOMADOR", clean_text_basic),        
-        "asegurado": find_by_regex(text, r"TOMADOR\s*/\s*ASEGURADO:\s*([A-ZÁÉÍÓÚÜÑ\s\-]+?)\s*(?:[•·]\s*)?IDENTIFICACIÓN:", clean_text_basic),
-        "identificacion": find_by_regex(text, r"IDENTIFICACIÓN:\s*([C\.\sE\d\.]+)(?:\s*VIGENCIA)?", clean_number),        
-        "vigencia_inicio": find_by_regex(text, r"FECHA DE INICIO:\s*(\d{1,2} DE [A-ZÁÉÍÓÚÜÑ]+ DE \d{4}.*?)(?:[•·]\s*)(?=\s*FECHA DE FIN)"),
-        "vigencia_fin": find_by_regex(text, r"FECHA DE FIN:\s*(\d{1,2} DE [A-ZÁÉÍÓÚÜÑ]+ DE \d{4}.*?)(?=\s*RESUMEN|4\.)", ),                        
-        "cobertura_rc_monto": find_by_regex(text, r"RESPONSABILIDAD CIVIL EXTRACONTRACTUAL:\s*(.+?COP)", clean_currency),        
-        "cobertura_daños": find_by_regex(text, r"PÉRDIDA TOTAL POR DAÑOS:\s*(.+?)3\.", clean_text_basic),
-        "cobertura_hurto": find_by_regex(text, r"PÉRDIDA TOTAL POR HURTO:\s*(.+?)4\.", clean_text_basic),
-        "cobertura_asistencia": find_by_regex(text, r"ASISTENCIA JURÍDICA:\s*(.+?)ESTADO", clean_text_basic),
-        "estado_poliza": find_by_regex(text, r"ESTADO DE LA PÓLIZA:\s*([A-Z]+)", clean_text_basic),
-    }
+    return extract_fields(EXTRACTION_SPECS["acta_seguro"], text)
 
 def extract_contrato(text):
-    
-    text_processed = ' '.join(text.lower().split())
-    
-    return {
-        "numero_contrato": find_by_regex(text_processed, r"profesionales no\.?\s*([\d\-]+)", clean_number),                
-        "contratante_nombre": find_by_regex(text_processed, r"por una parte,\s*(.+?)\s*s\.?a\.?s\.?,", clean_text_basic),                
-        "contratante_nit": find_by_regex(text_processed, r"nit\s*([\d\.\-]+)", clean_number),                 
-        "contratista_nombre": find_by_regex(text_processed, r"por otra parte,\s*([a-záéíóúüñ\s]+),?\s*identificada", clean_text_basic),                
-        "contratista_identificacion": find_by_regex(text_processed, r"cédula de ciudadanía no\.?\s*([\d\.]+)", clean_number),                 
-        "valor_contrato_monto": find_by_regex(text_processed, r"valor total.*?(\$[\d\.\,]+\s*cop)", clean_currency),
-        "objeto_del_contrato_texto": find_by_regex(text_processed, r"cláusula primera\s*-\s*objeto:\s*(.*?)(?=cláusula segunda)", clean_text_basic),
-        "duracion_inicio": find_by_regex(text_processed, r"contados a partir del ([0-9]{1,2} de [a-z]+ de \d{4})"),
-        "duracion_fin": find_by_regex(text_processed, r"hasta el ([0-9]{1,2} de [a-z]+ de \d{4})"),
-        "fecha_firma": find_by_regex(text_processed, r"a los ([0-9]{1,2} días del mes de [a-z]+ de \d{4})")
-    }
-
-def extract_structured_data(document_type, azure_json):
-    text = azure_json.get("content", "").lower()
-    match document_type:
-        case "cedula": extracted_fields = extract_cedula(text)
-        case "acta_seguro": extracted_fields = extract_acta_seguro(text)
-        case "contrato": extracted_fields = extract_contrato(text)
-        case _: extracted_fields = {}
+    return extract_fields(EXTRACTION_SPECS["contrato"], text)
+
+# Versión del motor de extracción: súbase al cambiar su comportamiento de una forma que
+# el hash de las funciones del motor no detecte (p. ej. en una dependencia).
+EXTRACTOR_VERSION = 1
+
+def _const_signature(const):
+    """Representación estable de una constante de bytecode (sin direcciones de memoria ni orden de hash)."""
+    if isinstance(const, types.CodeType):
+        return _code_object_signature(const)
+    if isinstance(const, frozenset):
+        return f"frozenset({sorted(_const_signature(c) for c in const)!r})"
+    if isinstance(const, tuple):
+        return f"({', '.join(_const_signature(c) for c in const)})"
+    return repr(const)
+
+def _code_object_signature(code):
+    """Bytecode, nombres y constantes, incluidas las comprensiones anidadas; sin el docstring."""
+    consts = code.co_consts
+    if consts and (not code.co_name.startswith("<") or code.co_name == "<lambda>"):
+        consts = consts[1:]  # docstring (o None) de funciones y lambdas
+    return repr((code.co_code, code.co_names, [_const_signature(c) for c in consts]))
+
+def _code_signature(func):
+    code = getattr(func, "__code__", None)
+    if code:
+        return _code_object_signature(code)
+    return repr(func) if func is None else f"{getattr(func, '__module__', '')}.{getattr(func, '__qualname__', '')}"
+
+def engine_version():
+    """
+    Hash del motor compartido por todos los tipos: EXTRACTOR_VERSION, las
+    funciones de búsqueda y de layout y sus constantes.
+    """
+    engine = [
+        literal_prefix, field, document_spec, match_value, anchors_usable, search_field, extract_fields,
+        LayoutText.__init__, LayoutText.line_index, LayoutText.region_end, LayoutText.location,
+        key_value_locations, search_layout_field, extract_fields_with_layout,
+    ]
+    parts = [str(EXTRACTOR_VERSION), str(LAYOUT_WINDOW_LINES), str(LAYOUT_MARGIN_CHARS), repr(CASE_VARIANTS)]
+    parts += [_code_signature(func) for func in engine]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+def spec_version(spec):
+    """
+    Versión del extractor de un tipo: hash del motor y de sus patrones,
+    anclajes, funciones de limpieza y normalización. Cambia sola al modificar
+    cualquiera de ellos.
+    """
+    parts = [engine_version(), _code_signature(spec.normalize), spec.joiner]
+    for f in spec.fields:
+        parts += [f.name, f.pattern.pattern, str(f.pattern.flags), f.anchor, _code_signature(f.cleaning_func)]
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:16]
+
+SPEC_VERSIONS = {tipo: spec_version(spec) for tipo, spec in EXTRACTION_SPECS.items()}
+
+def _serialize(value):
+    """
+    Bytes de listas, dicts y números del JSON de Azure (marshal es mucho más
+    rápido que repr). Versión 2: desde la 3 la salida depende de las referencias.
+    """
+    try:
+        return marshal.dumps(value, 2)
+    except ValueError:
+        return repr(value).encode("utf-8")
+
+def extraction_key(document_type, azure_json):
+    """
+    Clave de la caché de extracción: tipo, versión de su extractor y hash de
+    lo que lee la extracción: content, líneas por página con sus polígonos y
+    pares clave-valor con sus regiones (las ubicaciones se guardan en la caché).
+    """
+    digest = hashlib.blake2b(azure_json.get("content", "").encode("utf-8"), digest_size=16)
+    for page in azure_json.get("pages") or []:
+        lines = page.get("lines") or []
+        digest.update(f"\0page={page.get('page_number')}\0".encode("utf-8"))
+        digest.update("\n".join(line.get("content", "") for line in lines).encode("utf-8"))
+        digest.update(_serialize([line.get("polygon") for line in lines]))
+    for pair in azure_json.get("key_value_pairs") or []:
+        key, value = pair.get("key") or {}, pair.get("value") or {}
+        digest.update(_serialize([key.get("content"), key.get("bounding_regions"),
+                                  value.get("content"), value.get("bounding_regions")]))
+    return f"{document_type}:{SPEC_VERSIONS[document_type]}:{digest.hexdigest()}"
+
+def extract_structured_data(document_type, azure_json, use_cache=True):
+    """
+    Campos del documento según su tipo. Con use_cache, el resultado se
+    memoriza por (tipo, versión del extractor, hash del contenido).
+    """
+    spec = EXTRACTION_SPECS.get(document_type)
+    if not spec:
+        return {}
+
+    cache_key = extraction_key(document_type, azure_json) if use_cache else None
+    if cache_key:
+        cached = extraction_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+    extracted_fields = extract_fields_with_layout(spec, azure_json)
 
     structured_output = {}
-    for key, value in extracted_fields.items():
+    for key, (value, location) in extracted_fields.items():
         if value is not None:
             structured_output[key] = {"value": value}
-    return structured_output
\ No newline at end of file
+            if location:
+                structured_output[key]["ubicacion"] = location
+    if cache_key:
+        extraction_cache.set(cache_key, copy.deepcopy(structured_output))
+    return structured_output
@@ -0,0 +1,318 @@
+"""
+Cola de trabajos persistente en SQLite.
+
+Cada lote subido es un trabajo con un registro por documento (estado, campos
+extraídos y validación). Un hilo en segundo plano procesa los documentos
+pendientes, así el script de Streamlit no se bloquea y los resultados
+sobreviven a un refresco del navegador. Al reiniciar, los documentos que
+quedaron "procesando" vuelven a "pendiente"; repetir un análisis es seguro
+porque el resultado de Azure se toma de la caché. Los trabajos terminados se
+conservan JOB_TTL_SECONDS desde su creación.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from config import env
+from azure_client import MAX_CONCURRENT_ANALYSES
+from pipeline import analyze_pdf, build_document, run_stages
+from spool import spool_document, load_bytes, load_json
+from dedup import dedup_index, reuse_document, simhash
+from search import search_index
+import metrics
+
+JOBS_PATH = env("JOBS_PATH", os.path.join(".smartdoc_cache", "jobs.sqlite"))
+JOB_TTL_SECONDS = int(env("JOB_TTL_SECONDS", str(7 * 24 * 3600)))
+WORKER_POLL_SECONDS = 2.0
+
+logger = logging.getLogger(__name__)
+
+PENDIENTE = "pendiente"
+PROCESANDO = "procesando"
+LISTO = "listo"
+ERROR = "error"
+
+
+class JobStore:
+    """Almacén de trabajos y de sus documentos en SQLite."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS jobs (id TEXT PRIMARY KEY, created REAL NOT NULL)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_created ON jobs (created)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_documents ("
+                " job_id TEXT NOT NULL, position INTEGER NOT NULL, file_name TEXT NOT NULL,"
+                " handle TEXT NOT NULL, status TEXT NOT NULL, doc TEXT, error TEXT, updated REAL NOT NULL,"
+                " PRIMARY KEY (job_id, position))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS job_documents_status ON job_documents (status)")
+        return self._conn
+
+    def create_job(self, files):
+        """Registra un trabajo con los (nombre, bytes) dados y devuelve su id."""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        rows = [
+            (job_id, position, file_name, spool_document(document_bytes), PENDIENTE, now)
+            for position, (file_name, document_bytes) in enumerate(files)
+        ]
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT INTO jobs (id, created) VALUES (?, ?)", (job_id, now))
+            conn.executemany(
+                "INSERT INTO job_documents (job_id, position, file_name, handle, status, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            conn.commit()
+        return job_id
+
+    def claim(self, limit):
+        """Marca como "procesando" hasta `limit` documentos pendientes y los devuelve."""
+        with self._lock:
+            conn = self._connection()
+            rows = conn.execute(
+                "SELECT job_id, position, file_name, handle FROM job_documents"
+                " WHERE status = ? ORDER BY updated, job_id, position LIMIT ?", (PENDIENTE, limit)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE job_documents SET status = ?, updated = ? WHERE job_id = ? AND position = ?",
+                [(PROCESANDO, time.time(), job_id, position) for job_id, position, _, _ in rows]
+            )
+            conn.commit()
+        return rows
+
+    def recover(self):
+        """Devuelve a "pendiente" los documentos interrumpidos por una caída."""
+        with self._lock:
+            conn = self._connection()
+            count = conn.execute(
+                "UPDATE job_documents SET status = ? WHERE status = ?", (PENDIENTE, PROCESANDO)
+            ).rowcount
+            conn.commit()
+        return count
+
+    def finish(self, job_id, position, doc=None, error=None):
+        """Guarda el resultado (o el error) de un documento."""
+        status = ERROR if error else LISTO
+        payload = json.dumps(doc, ensure_ascii=False) if doc is not None else None
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "UPDATE job_documents SET status = ?, doc = ?, error = ?, updated = ?"
+                " WHERE job_id = ? AND position = ?",
+                (status, payload, error, time.time(), job_id, position)
+            )
+            conn.commit()
+
+    def save_document(self, doc):
+        """Persiste los cambios de revisión (campos, validación y estado) de un documento."""
+        if "job_id" in doc:
+            self.finish(doc["job_id"], doc["position"], doc)
+
+    def progress(self, job_id):
+        """Cantidad de documentos del trabajo por estado."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT status, COUNT(*) FROM job_documents WHERE job_id = ? GROUP BY status", (job_id,)
+            ).fetchall()
+        counts = {PENDIENTE: 0, PROCESANDO: 0, LISTO: 0, ERROR: 0, **dict(rows)}
+        counts["total"] = sum(count for _, count in rows)
+        counts["done"] = counts["total"] > 0 and counts[LISTO] + counts[ERROR] == counts["total"]
+        return counts
+
+    def has_pending(self):
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT 1 FROM job_documents WHERE status IN (?, ?) LIMIT 1", (PENDIENTE, PROCESANDO)
+            ).fetchone()
+        return row is not None
+
+    def load_documents(self, job_id, skip=()):
+        """Documentos terminados del trabajo en el orden de carga, salvo las posiciones en `skip`."""
+        with self._lock:
+            rows = self._connection().execute(
+                "SELECT position, doc FROM job_documents WHERE job_id = ? AND status = ? ORDER BY position",
+                (job_id, LISTO)
+            ).fetchall()
+        return [json.loads(doc) for position, doc in rows if position not in skip]
+
+    def purge_expired(self, max_age_seconds=JOB_TTL_SECONDS):
+        """
+        Elimina los trabajos creados hace más de max_age_seconds y sus documentos,
+        salvo los que todavía tienen documentos pendientes o en proceso.
+        Devuelve la cantidad de trabajos eliminados.
+        """
+        limit = time.time() - max_age_seconds
+        with self._lock:
+            conn = self._connection()
+            expired = conn.execute(
+                "SELECT id FROM jobs WHERE created < ? AND NOT EXISTS ("
+                " SELECT 1 FROM job_documents WHERE job_id = jobs.id AND status IN (?, ?))",
+                (limit, PENDIENTE, PROCESANDO)
+            ).fetchall()
+            conn.executemany("DELETE FROM job_documents WHERE job_id = ?", expired)
+            conn.executemany("DELETE FROM jobs WHERE id = ?", expired)
+            conn.commit()
+        return len(expired)
+
+    def referenced_handles(self):
+        """Handles del spool que usa algún documento de un trabajo vigente (ver purge_expired)."""
+        with self._lock:
+            return {handle for handle, in self._connection().execute("SELECT DISTINCT handle FROM job_documents")}
+
+    def finished_documents(self):
+        """(nombre de archivo, handle) de los documentos terminados de todos los trabajos."""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT file_name, handle FROM job_documents WHERE status = ? ORDER BY job_id, position", (LISTO,)
+            ).fetchall()
+
+    def load_errors(self, job_id):
+        """(nombre de archivo, error) de los documentos que fallaron."""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT file_name, error FROM job_documents WHERE job_id = ? AND status = ? ORDER BY position",
+                (job_id, ERROR)
+            ).fetchall()
+
+
+job_store = JobStore(JOBS_PATH)
+
+_worker = None
+_worker_lock = threading.Lock()
+_wakeup = threading.Event()
+
+
+def _finish_document(store, job_id, position, doc, content):
+    doc["job_id"] = job_id
+    doc["position"] = position
+    if "duplicado" in doc:
+        metrics.increment("duplicates", doc["tipo"])
+    store.finish(job_id, position, doc)
+    search_index.index_document(doc, content)
+
+def _intake_stage(item):
+    """Los duplicados exactos de documentos ya procesados no se envían a Azure."""
+    prior = dedup_index.find_exact(item["handle"])
+    if prior:
+        item["content"] = (load_json(item["handle"]) or {}).get("content", "")
+        item["doc"] = reuse_document(item["file_name"], item["handle"], prior, "exacto")
+        item["done"] = True
+        return item
+    try:
+        item["bytes"] = load_bytes(item["handle"])
+    except FileNotFoundError:
+        raise FileNotFoundError("El archivo ya no está disponible en el spool.") from None
+    return item
+
+def _analyze_stage(item):
+    item["azure_json"] = analyze_pdf(item["bytes"])
+    return item
+
+def _build_stage(item):
+    """Clasifica, extrae y valida; los duplicados (exactos o similares) heredan la extracción previa."""
+    azure_json = item.pop("azure_json")
+    doc = build_document(item["file_name"], azure_json)
+    doc["handle"] = spool_document(item.pop("bytes"), azure_json)
+
+    item["content"] = azure_json.get("content", "")
+    item["fingerprint"] = simhash(item["content"])
+    prior = dedup_index.find_exact(item["handle"])
+    if prior:
+        item["doc"] = reuse_document(item["file_name"], item["handle"], prior, "exacto")
+        return item
+
+    prior = dedup_index.find_similar(doc, item["fingerprint"])
+    if prior:
+        doc = reuse_document(item["file_name"], item["handle"], prior, "similar")
+    item["doc"] = doc
+    item["remember"] = True
+    return item
+
+PIPELINE_STAGES = [
+    ("intake", _intake_stage, 1),
+    ("analyze", _analyze_stage, MAX_CONCURRENT_ANALYSES),
+    ("build", _build_stage, 1),
+]
+
+def process_claimed(store, rows):
+    """
+    Procesa los documentos reclamados en etapas solapadas (lectura del spool y
+    duplicados exactos, análisis en Azure, clasificación y extracción) y
+    guarda cada resultado apenas sale de la última etapa.
+    """
+    items = (
+        {"job_id": job_id, "position": position, "file_name": file_name, "handle": handle}
+        for job_id, position, file_name, handle in rows
+    )
+    for item in run_stages(items, PIPELINE_STAGES):
+        try:
+            if "error" in item:
+                raise item["error"]
+            _finish_document(store, item["job_id"], item["position"], item["doc"], item["content"])
+            if item.get("remember"):
+                dedup_index.remember(item["doc"], item["fingerprint"])
+        except Exception as e:
+            # Un error de un documento no debe detener el consumo: las etapas quedarían bloqueadas.
+            metrics.increment("errors")
+            logger.warning("Error en %s (trabajo %s): %s", item["file_name"], item["job_id"], e)
+            try:
+                store.finish(item["job_id"], item["position"], error=str(e))
+            except Exception:
+                logger.exception("No se pudo guardar el error de %s", item["file_name"])
+
+def _claimed_rows(store):
+    """Reclama los pendientes de a poco: un documento sigue "pendiente" hasta que entra al flujo."""
+    while True:
+        rows = store.claim(MAX_CONCURRENT_ANALYSES)
+        if not rows:
+            return
+        yield from rows
+
+def _run_worker(store):
+    store.recover()
+    while True:
+        try:
+            process_claimed(store, _claimed_rows(store))
+        except Exception:
+            # Falla del almacén (p. ej. al reclamar): se reintenta en la próxima vuelta y los
+            # documentos que quedaron "procesando" vuelven a "pendiente".
+            logger.exception("Error en el hilo de trabajos")
+            _wakeup.wait(WORKER_POLL_SECONDS)
+            try:
+                store.recover()
+            except Exception:
+                logger.exception("No se pudieron recuperar los documentos en curso")
+            continue
+        _wakeup.wait(WORKER_POLL_SECONDS)
+        _wakeup.clear()
+
+def ensure_worker(store=job_store):
+    """Inicia (una sola vez por proceso) el hilo que procesa los trabajos pendientes."""
+    global _worker
+    if _worker is None or not _worker.is_alive():
+        with _worker_lock:
+            if _worker is None or not _worker.is_alive():
+                _worker = threading.Thread(target=_run_worker, args=(store,), name="smartdoc-jobs", daemon=True)
+                _worker.start()
+    _wakeup.set()
+
+def submit_job(files, store=job_store):
+    """Crea el trabajo y despierta al hilo de procesamiento. Devuelve el id del trabajo."""
+    job_id = store.create_job(files)
+    ensure_worker(store)
+    return job_id
@@ -0,0 +1,132 @@
+"""
+Instrumentación liviana: tiempos y contadores por etapa y por tipo de documento.
+
+Se activa con METRICS_ENABLED=1. Desactivada, `clock()` devuelve 0 y
+`observe`/`increment` retornan de inmediato, así el costo en el flujo es una
+llamada y una comparación. Los datos se exportan como JSON (`snapshot`) o en
+formato de texto de Prometheus (`to_prometheus`), junto con las estadísticas de
+las cachés de análisis y de extracción y los reintentos del planificador de Azure.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from config import env
+
+METRICS_ENABLED = env("METRICS_ENABLED", "0") == "1"
+
+_lock = threading.Lock()
+# (etapa, tipo) -> [cantidad, segundos totales, máximo]
+_timings = {}
+# (nombre, tipo) -> valor
+_counters = {}
+
+
+def enabled():
+    return METRICS_ENABLED
+
+def set_enabled(value):
+    """Activa o desactiva la recolección en tiempo de ejecución."""
+    global METRICS_ENABLED
+    METRICS_ENABLED = bool(value)
+
+def clock():
+    """Marca de inicio para observe(); 0 si las métricas están desactivadas."""
+    return time.perf_counter() if METRICS_ENABLED else 0.0
+
+def observe(stage, start, tipo=""):
+    """Registra la duración de una etapa iniciada en `start` (valor de clock())."""
+    if not METRICS_ENABLED or not start:
+        return
+    elapsed = time.perf_counter() - start
+    with _lock:
+        timing = _timings.get((stage, tipo))
+        if timing is None:
+            _timings[(stage, tipo)] = [1, elapsed, elapsed]
+        else:
+            timing[0] += 1
+            timing[1] += elapsed
+            if elapsed > timing[2]:
+                timing[2] = elapsed
+
+@contextmanager
+def timer(stage, tipo=""):
+    """Mide el bloque como la etapa `stage`."""
+    start = clock()
+    try:
+        yield
+    finally:
+        observe(stage, start, tipo)
+
+def increment(name, tipo="", amount=1):
+    """Suma `amount` al contador `name`."""
+    if not METRICS_ENABLED:
+        return
+    with _lock:
+        _counters[(name, tipo)] = _counters.get((name, tipo), 0) + amount
+
+def reset():
+    with _lock:
+        _timings.clear()
+        _counters.clear()
+
+
+def _service_stats():
+    from cache import analysis_cache, extraction_cache
+    from azure_client import scheduler
+
+    return {"cache": analysis_cache.stats(), "extraction_cache": extraction_cache.stats(), "azure": scheduler.stats()}
+
+def snapshot():
+    """Métricas actuales como dict serializable a JSON."""
+    with _lock:
+        stages = [
+            {"stage": stage, "tipo": tipo, "count": count, "total_seconds": total,
+             "avg_seconds": total / count, "max_seconds": maximum}
+            for (stage, tipo), (count, total, maximum) in sorted(_timings.items())
+        ]
+        counters = [
+            {"name": name, "tipo": tipo, "value": value}
+            for (name, tipo), value in sorted(_counters.items())
+        ]
+    return {"enabled": METRICS_ENABLED, "stages": stages, "counters": counters, **_service_stats()}
+
+def _labels(**labels):
+    pairs = ",".join(f'{key}="{value}"' for key, value in labels.items() if value)
+    return "{" + pairs + "}" if pairs else ""
+
+def to_prometheus():
+    """Métricas actuales en formato de exposición de texto de Prometheus."""
+    data = snapshot()
+    lines = [
+        "# HELP smartdoc_stage_seconds Duración de cada etapa del procesamiento.",
+        "# TYPE smartdoc_stage_seconds summary",
+    ]
+    for s in data["stages"]:
+        labels = _labels(stage=s["stage"], tipo=s["tipo"])
+        lines.append(f"smartdoc_stage_seconds_count{labels} {s['count']}")
+        lines.append(f"smartdoc_stage_seconds_sum{labels} {s['total_seconds']:.6f}")
+    lines.append("# TYPE smartdoc_stage_seconds_max gauge")
+    for s in data["stages"]:
+        lines.append(f"smartdoc_stage_seconds_max{_labels(stage=s['stage'], tipo=s['tipo'])} {s['max_seconds']:.6f}")
+
+    for name in sorted({c["name"] for c in data["counters"]}):
+        lines.append(f"# TYPE smartdoc_{name}_total counter")
+        for c in data["counters"]:
+            if c["name"] == name:
+                lines.append(f"smartdoc_{name}_total{_labels(tipo=c['tipo'])} {c['value']}")
+
+    cache, azure = data["cache"], data["azure"]
+    lines += [
+        "# TYPE smartdoc_cache_hits_total counter", f"smartdoc_cache_hits_total {cache['hits']}",
+        "# TYPE smartdoc_cache_misses_total counter", f"smartdoc_cache_misses_total {cache['misses']}",
+        "# TYPE smartdoc_cache_evictions_total counter", f"smartdoc_cache_evictions_total {cache['evictions']}",
+        "# TYPE smartdoc_cache_hit_ratio gauge", f"smartdoc_cache_hit_ratio {cache['hit_rate']:.4f}",
+        "# TYPE smartdoc_extraction_cache_hits_total counter",
+        f"smartdoc_extraction_cache_hits_total {data['extraction_cache']['hits']}",
+        "# TYPE smartdoc_extraction_cache_misses_total counter",
+        f"smartdoc_extraction_cache_misses_total {data['extraction_cache']['misses']}",
+        "# TYPE smartdoc_azure_retries_total counter", f"smartdoc_azure_retries_total {azure['retries']}",
+        "# TYPE smartdoc_azure_throttled_total counter", f"smartdoc_azure_throttled_total {azure['throttled']}",
+        "# TYPE smartdoc_azure_in_flight gauge", f"smartdoc_azure_in_flight {azure['in_flight']}",
+    ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,169 @@
+import os
+import queue
+import threading
+import metrics
+from config import env
+from azure_client import analyze_bytes_document, analyze_document, count_pdf_pages, MAX_CONCURRENT_ANALYSES
+from extractors import extract_structured_data
+from document_utils import classify_document_scored, validate_document
+
+
+QUICK_CLASSIFY = env("QUICK_CLASSIFY", "0") == "1"
+# Capacidad de cada cola entre etapas: limita los documentos en memoria entre etapas.
+PIPELINE_QUEUE_SIZE = int(env("PIPELINE_QUEUE_SIZE", str(MAX_CONCURRENT_ANALYSES * 2)))
+
+_END = object()
+
+
+def analyze_pdf(document_bytes, model_id="prebuilt-read", quick_classify=QUICK_CLASSIFY):
+    """
+    Analiza el PDF para la extracción. Con quick_classify, en documentos de
+    varias páginas primero se analiza solo la primera: si no corresponde a un
+    tipo conocido se devuelve ese resultado sin pedir el análisis completo.
+    """
+    with metrics.timer("analyze"):
+        return _analyze_pdf(document_bytes, model_id, quick_classify)
+
+def _analyze_pdf(document_bytes, model_id, quick_classify):
+    if quick_classify and (count_pdf_pages(document_bytes) or 1) > 1:
+        first_page = analyze_bytes_document(document_bytes, model_id, pages="1")
+        tipo, _ = classify_document_scored(first_page.get("content", ""))
+        if tipo == "desconocido":
+            return first_page
+    return analyze_document(document_bytes, model_id)
+
+
+def build_document(file_name, azure_json, use_cache=True):
+    """
+    Clasifica, extrae y valida un documento a partir del resultado de Azure.
+    `use_cache` se pasa a la extracción (caché por contenido y versión del extractor).
+    """
+    start = metrics.clock()
+    tipo, confianza = classify_document_scored(azure_json.get("content", ""))
+    metrics.observe("classify", start, tipo)
+
+    start = metrics.clock()
+    extraccion = extract_structured_data(tipo, azure_json, use_cache)
+    metrics.observe("extract", start, tipo)
+
+    doc = {
+        "file_name": file_name,
+        "tipo": tipo,
+        "confianza": confianza,
+        "extraccion": extraccion,
+        "estado": "Revisar",
+        "validacion": {}
+    }
+    start = metrics.clock()
+    validate_document(doc)
+    metrics.observe("validate", start, tipo)
+
+    metrics.increment("documents", tipo)
+    if doc["estado"] == "Revisar":
+        metrics.increment("documents_to_review", tipo)
+    return doc
+
+
+def iter_pdf_paths(directory, recursive=False):
+    """Recorre un directorio y genera las rutas de los PDF sin cargarlas todas en memoria."""
+    with os.scandir(directory) as entries:
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.is_dir() and recursive:
+                yield from iter_pdf_paths(entry.path, recursive)
+            elif entry.is_file() and entry.name.lower().endswith(".pdf"):
+                yield entry.path
+
+
+def run_stages(items, stages, queue_size=PIPELINE_QUEUE_SIZE):
+    """
+    Procesa `items` en etapas que se solapan, unidas por colas acotadas.
+    `stages` es una lista de (nombre, función, hilos); cada función recibe el
+    elemento (un dict) y lo devuelve completado. Si una etapa lanza una
+    excepción, el elemento sigue con item["error"] y las etapas siguientes no
+    lo tocan; lo mismo si una etapa lo marca con item["done"]. Genera los
+    elementos a medida que salen de la última etapa (orden de terminación).
+    Una cola llena frena a la etapa anterior, incluida la lectura de `items`.
+    """
+    queues = [queue.Queue(maxsize=max(1, queue_size)) for _ in range(len(stages) + 1)]
+    workers = [max(1, count) for _, _, count in stages]
+
+    failures = []
+
+    def feed():
+        try:
+            for item in items:
+                queues[0].put(item)
+        except Exception as e:
+            failures.append(e)
+        finally:
+            for _ in range(workers[0]):
+                queues[0].put(_END)
+
+    def work(k, func):
+        source, target = queues[k], queues[k + 1]
+        while True:
+            item = source.get()
+            if item is _END:
+                return
+            if "error" not in item and not item.get("done"):
+                try:
+                    item = func(item)
+                except Exception as e:
+                    item["error"] = e
+            target.put(item)
+
+    def close(k, threads):
+        for thread in threads:
+            thread.join()
+        for _ in range(workers[k + 1] if k + 1 < len(stages) else 1):
+            queues[k + 1].put(_END)
+
+    threading.Thread(target=feed, name="smartdoc-feed", daemon=True).start()
+    for k, (name, func, _) in enumerate(stages):
+        threads = [
+            threading.Thread(target=work, args=(k, func), name=f"smartdoc-{name}-{n}", daemon=True)
+            for n in range(workers[k])
+        ]
+        for thread in threads:
+            thread.start()
+        threading.Thread(target=close, args=(k, threads), daemon=True).start()
+
+    while True:
+        item = queues[-1].get()
+        if item is _END:
+            if failures:
+                raise failures[0]
+            return
+        yield item
+
+
+def _read_stage(item):
+    with open(item["path"], "rb") as f:
+        item["bytes"] = f.read()
+    return item
+
+def _analyze_stage(item):
+    item["azure_json"] = analyze_pdf(item.pop("bytes"))
+    return item
+
+def _build_stage(item):
+    item["doc"] = build_document(os.path.basename(item["path"]), item.pop("azure_json"))
+    return item
+
+def process_paths(paths, max_workers=MAX_CONCURRENT_ANALYSES):
+    """
+    Procesa rutas de PDF en etapas solapadas (lectura, análisis en Azure con
+    `max_workers` hilos, clasificación y extracción), generando
+    (ruta, documento, error) a medida que terminan.
+    """
+    stages = [
+        ("read", _read_stage, 1),
+        ("analyze", _analyze_stage, max_workers),
+        ("build", _build_stage, 1),
+    ]
+    for item in run_stages(({"path": path} for path in paths), stages):
+        if "error" in item:
+            metrics.increment("errors")
+            yield item["path"], None, item["error"]
+        else:
+            yield item["path"], item["doc"], None
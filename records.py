@@ -0,0 +1,173 @@
+"""
+Representación compacta de documentos extraídos.
+
+`DocumentRecord` guarda los valores en una lista alineada con los campos del
+extractor de su tipo (`EXTRACTION_SPECS`), con `__slots__` y sin un dict por
+campo. Se convierte desde y hacia la forma de dict que usa el resto de la
+aplicación (`from_dict` / `to_dict`), así puede usarse en procesos por lotes
+(agregación, revalidación por columna, exportación) sin cambiar la interfaz.
+"""
+from enum import Enum
+from extractors import EXTRACTION_SPECS
+from document_utils import get_field_type, validate_column, validate_field_format
+
+
+class Estado(str, Enum):
+    REVISAR = "Revisar"
+    VALIDADO = "Validado"
+
+
+# Campos de cada tipo en el orden del extractor, y su tipo de dato.
+FIELD_NAMES = {tipo: tuple(f.name for f in spec.fields) for tipo, spec in EXTRACTION_SPECS.items()}
+FIELD_INDEX = {tipo: {name: i for i, name in enumerate(names)} for tipo, names in FIELD_NAMES.items()}
+FIELD_TYPES = {tipo: tuple(get_field_type(name) for name in names) for tipo, names in FIELD_NAMES.items()}
+# Claves del dict de documento que el registro guarda en atributos propios.
+DOC_KEYS = {"file_name", "tipo", "confianza", "extraccion", "estado", "validacion", "handle"}
+# Claves de un campo extraído que el registro guarda en values y locations.
+FIELD_KEYS = {"value", "ubicacion"}
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+    def __reduce__(self):
+        return "MISSING"
+
+# Marca de campo o clave no presente (distinto de un valor None o vacío).
+MISSING = _Missing()
+
+
+class DocumentRecord:
+    """
+    Documento con valores ordenados según el esquema de su tipo.
+    - confianza, handle: MISSING si el dict original no tenía la clave.
+    - values: lista alineada con FIELD_NAMES[tipo] (MISSING si el campo no se extrajo).
+    - locations: {campo: ubicacion} solo para los campos que la tienen, o None.
+    - errors: {campo: mensaje} de validación, o None si no hay errores.
+    - other: campos fuera del esquema y claves adicionales del dict original, o None.
+    """
+    __slots__ = ("file_name", "tipo", "confianza", "estado", "handle", "values", "locations", "errors", "other")
+
+    def __init__(self, file_name, tipo, confianza=1.0, estado=Estado.REVISAR, handle=MISSING,
+                 values=None, locations=None, errors=None, other=None):
+        self.file_name = file_name
+        self.tipo = tipo
+        self.confianza = confianza
+        self.estado = Estado(estado)
+        self.handle = handle
+        self.values = values if values is not None else [MISSING] * len(FIELD_NAMES.get(tipo, ()))
+        self.locations = locations
+        self.errors = errors
+        self.other = other
+
+    @classmethod
+    def from_dict(cls, doc):
+        """Crea el registro a partir del dict de documento de la aplicación."""
+        names = FIELD_NAMES.get(doc["tipo"], ())
+        index = FIELD_INDEX.get(doc["tipo"], {})
+        values = [MISSING] * len(names)
+        locations = None
+        extra_fields = None
+
+        for key, data in doc["extraccion"].items():
+            i = index.get(key)
+            if i is None or "value" not in data or not data.keys() <= FIELD_KEYS:
+                extra_fields = extra_fields or {}
+                extra_fields[key] = data
+                continue
+            values[i] = data.get("value")
+            if "ubicacion" in data:
+                locations = locations or {}
+                locations[key] = data["ubicacion"]
+
+        other = {k: v for k, v in doc.items() if k not in DOC_KEYS} or None
+        if extra_fields:
+            other = other or {}
+            other["extraccion"] = extra_fields
+
+        return cls(doc["file_name"], doc["tipo"], doc.get("confianza", MISSING), doc["estado"],
+                   doc.get("handle", MISSING), values, locations, dict(doc["validacion"]) or None, other)
+
+    def to_dict(self):
+        """Dict con la forma original ({"extraccion": {campo: {"value": ...}}, ...})."""
+        extraccion = {}
+        for name, value in zip(FIELD_NAMES.get(self.tipo, ()), self.values):
+            if value is MISSING:
+                continue
+            extraccion[name] = {"value": value}
+            if self.locations and name in self.locations:
+                extraccion[name]["ubicacion"] = self.locations[name]
+
+        other = dict(self.other or {})
+        extraccion.update(other.pop("extraccion", {}))
+        doc = {"file_name": self.file_name, "tipo": self.tipo}
+        if self.confianza is not MISSING:
+            doc["confianza"] = self.confianza
+        doc["extraccion"] = extraccion
+        doc["estado"] = self.estado.value
+        doc["validacion"] = dict(self.errors or {})
+        if self.handle is not MISSING:
+            doc["handle"] = self.handle
+        doc.update(other)
+        return doc
+
+    def get(self, name, default=None):
+        """Valor del campo, o `default` si no se extrajo."""
+        i = FIELD_INDEX.get(self.tipo, {}).get(name)
+        if i is None:
+            return ((self.other or {}).get("extraccion", {}).get(name) or {}).get("value", default)
+        value = self.values[i]
+        return default if value is MISSING else value
+
+    def excel_row(self):
+        """Fila del Excel: archivo, estado y los valores en el orden de excel_columns(tipo)."""
+        return [self.file_name, self.estado.value] + [None if v is MISSING else v for v in self.values]
+
+    def __repr__(self):
+        return f"DocumentRecord({self.file_name!r}, {self.tipo!r}, {self.estado.value!r})"
+
+
+def revalidate_records(records):
+    """
+    Revalida una lista de registros columna por columna: agrupa por tipo y
+    valida todos los valores de cada campo con validate_column.
+    """
+    by_type = {}
+    for record in records:
+        by_type.setdefault(record.tipo, []).append(record)
+
+    for tipo, group in by_type.items():
+        for record in group:
+            record.errors = None
+            for name, data in ((record.other or {}).get("extraccion") or {}).items():
+                message = validate_field_format(name, data.get("value", ""))
+                if message:
+                    record.errors = record.errors or {}
+                    record.errors[name] = message
+        for i, name in enumerate(FIELD_NAMES.get(tipo, ())):
+            present = [record for record in group if record.values[i] is not MISSING]
+            messages = validate_column(name, [record.values[i] for record in present])
+            for record, message in zip(present, messages):
+                if message:
+                    if record.errors is None:
+                        record.errors = {}
+                    record.errors[name] = message
+        for record in group:
+            record.estado = Estado.REVISAR if record.errors else Estado.VALIDADO
+    return records
+
+def summarize(records):
+    """Totales del lote en una sola pasada: por tipo, pendientes de revisión y duplicados."""
+    summary = {"total": 0, "por_tipo": {}, "revisar": 0, "duplicados": 0}
+    por_tipo = summary["por_tipo"]
+    for record in records:
+        summary["total"] += 1
+        por_tipo[record.tipo] = por_tipo.get(record.tipo, 0) + 1
+        if record.estado is Estado.REVISAR:
+            summary["revisar"] += 1
+        if record.other and record.other.get("duplicado"):
+            summary["duplicados"] += 1
+    return summary
@@ -0,0 +1,126 @@
+"""
+Grabación y reproducción de respuestas de Azure Document Intelligence.
+
+`RecordingClient` envuelve el cliente real y guarda cada `result.to_dict()` en
+un directorio de fixtures. `ReplayClient` responde desde esos fixtures (o desde
+una función generadora) con latencia y errores configurables, sin credenciales
+ni red. Ambos se instalan con `azure_client.set_client`, o con las variables
+RECORD_DIR / REPLAY_DIR.
+"""
+import gzip
+import json
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+from cache import document_key
+
+
+def fixture_path(directory, document_bytes, model_id, pages=None):
+    return os.path.join(directory, document_key(document_bytes, model_id, pages) + ".json.gz")
+
+def save_fixture(directory, document_bytes, model_id, result, pages=None):
+    """Guarda un resultado de Azure como fixture comprimido."""
+    os.makedirs(directory, exist_ok=True)
+    path = fixture_path(directory, document_bytes, model_id, pages)
+    payload = json.dumps(result, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(gzip.compress(payload, compresslevel=5))
+    os.replace(tmp_path, path)
+
+def load_fixture(directory, document_bytes, model_id, pages=None):
+    """Lee el fixture del documento, o None si no fue grabado."""
+    try:
+        with gzip.open(fixture_path(directory, document_bytes, model_id, pages), "rb") as f:
+            return json.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+def http_error(status_code, retry_after=None):
+    """Error con la forma de HttpResponseError del SDK, para simular fallas del servicio."""
+    from azure.core.exceptions import HttpResponseError
+
+    error = HttpResponseError(message=f"Simulated response status {status_code}")
+    error.status_code = status_code
+    headers = {"Retry-After": str(retry_after)} if retry_after is not None else {}
+    error.response = SimpleNamespace(status_code=status_code, headers=headers)
+    return error
+
+
+class _Result:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def to_dict(self):
+        return self._payload
+
+
+class _Poller:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def result(self):
+        return _Result(self._payload)
+
+
+class RecordingClient:
+    """Cliente que delega en el real y graba cada respuesta en `directory`."""
+
+    def __init__(self, client, directory):
+        self.client = client
+        self.directory = directory
+
+    def begin_analyze_document(self, model_id, document, **kwargs):
+        result = self.client.begin_analyze_document(model_id=model_id, document=document, **kwargs).result().to_dict()
+        save_fixture(self.directory, document, model_id, result, kwargs.get("pages"))
+        return _Poller(result)
+
+
+class ReplayClient:
+    """
+    Cliente local que reproduce respuestas grabadas.
+
+    - latency / jitter: segundos de espera por solicitud (latency ± jitter).
+    - error_rate: fracción de solicitudes que fallan con `error_status`
+      (429 por defecto, con Retry-After de `retry_after` segundos).
+    - generator(document_bytes, model_id, pages) -> dict: respuesta para
+      documentos sin fixture; sin generador se lanza KeyError.
+    """
+
+    def __init__(self, directory=None, generator=None, latency=0.0, jitter=0.0,
+                 error_rate=0.0, error_status=429, retry_after=None, seed=None):
+        self.directory = directory
+        self.generator = generator
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _respond(self, document_bytes, model_id, pages):
+        if self.directory:
+            result = load_fixture(self.directory, document_bytes, model_id, pages)
+            if result is not None:
+                return result
+        if self.generator is None:
+            raise KeyError(f"No hay fixture para {document_key(document_bytes, model_id, pages)}")
+        return self.generator(document_bytes, model_id, pages)
+
+    def begin_analyze_document(self, model_id, document, **kwargs):
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            fail = self._random.random() < self.error_rate
+            if fail:
+                self.errors += 1
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise http_error(self.error_status, self.retry_after)
+        return _Poller(self._respond(document, model_id, kwargs.get("pages")))
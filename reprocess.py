@@ -0,0 +1,186 @@
+"""
+Reprocesamiento masivo de resultados de Azure archivados (sin llamar a Azure).
+
+El archivo es un JSONL con una línea por documento:
+{"file_name": ..., "handle": ..., "raw_json": {resultado de Azure}}. Se divide
+en tramos de bytes alineados a fin de línea y cada proceso del pool abre el
+archivo con mmap y procesa su tramo: al pool solo viaja (ruta, inicio, fin), no
+el contenido. Clasificación, extracción y validación corren en paralelo fuera
+del GIL y los resultados se devuelven en el orden del archivo.
+
+Uso:
+    python reprocess.py archivo.jsonl --output Reprocesado.xlsx --workers 8
+    python reprocess.py archivo.jsonl --from-jobs
+"""
+import argparse
+import json
+import mmap
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from config import env
+from pipeline import build_document
+from records import DocumentRecord
+
+REPROCESS_CHUNK_BYTES = int(env("REPROCESS_CHUNK_BYTES", str(4 * 1024 * 1024)))
+
+
+def write_archive(entries, path):
+    """Escribe (file_name, handle, raw_json) como archivo JSONL. Devuelve la cantidad de líneas."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for file_name, handle, raw_json in entries:
+            f.write(json.dumps({"file_name": file_name, "handle": handle, "raw_json": raw_json},
+                               separators=(",", ":"), ensure_ascii=False) + "\n")
+            count += 1
+    return count
+
+def archive_from_jobs(path, store=None):
+    """
+    Archiva los resultados de Azure guardados en el spool para los documentos
+    terminados de la cola de trabajos (uno por handle). Omite los que ya no están.
+    """
+    from jobs import job_store
+    from spool import load_json
+
+    def entries():
+        seen = set()
+        for file_name, handle in (store or job_store).finished_documents():
+            if handle in seen:
+                continue
+            seen.add(handle)
+            raw_json = load_json(handle)
+            if raw_json is None:
+                print(f"Sin resultado de Azure en el spool: {file_name} ({handle})", file=sys.stderr)
+                continue
+            yield file_name, handle, raw_json
+
+    return write_archive(entries(), path)
+
+
+def chunk_ranges(path, chunk_bytes=REPROCESS_CHUNK_BYTES):
+    """Tramos (inicio, fin) de unos chunk_bytes bytes que terminan en fin de línea."""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+
+    ranges = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            newline = mm.find(b"\n", min(start + max(1, chunk_bytes), size) - 1)
+            end = size if newline < 0 else newline + 1
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def process_range(path, start, end, use_cache=False):
+    """
+    Procesa las líneas del tramo [start, end). Devuelve una lista de
+    (DocumentRecord, error) en el orden del archivo; corre en el proceso del
+    pool, y los registros compactos son lo que vuelve al proceso principal.
+    """
+    results = []
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos < end:
+            newline = mm.find(b"\n", pos, end)
+            line_end = end if newline < 0 else newline
+            line, line_start = mm[pos:line_end], pos
+            pos = line_end + 1
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+                raw_json = entry.get("raw_json", entry)
+                doc = build_document(entry.get("file_name") or f"byte-{line_start}", raw_json, use_cache=use_cache)
+                if entry.get("handle"):
+                    doc["handle"] = entry["handle"]
+                results.append((DocumentRecord.from_dict(doc), None))
+            except Exception as e:
+                results.append((None, f"{type(e).__name__}: {e}"))
+    return results
+
+def _process_range(task):
+    return process_range(*task)
+
+def reprocess_archive(path, workers=None, chunk_bytes=REPROCESS_CHUNK_BYTES, use_cache=False):
+    """
+    Reprocesa el archivo en un pool de `workers` procesos (por defecto, uno por
+    núcleo) y genera (DocumentRecord, error) en el orden de las líneas. Mantiene a
+    lo sumo 2 tramos por proceso en vuelo, así la memoria no crece con el archivo.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [(path, start, end, use_cache) for start, end in chunk_ranges(path, chunk_bytes)]
+    if workers == 1:
+        for task in tasks:
+            yield from _process_range(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_process_range, task))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def run_reprocess(path, output, workers=None, chunk_bytes=REPROCESS_CHUNK_BYTES):
+    """
+    Reprocesa el archivo y escribe los documentos en un JSONL junto al reporte
+    (`<reporte>.reprocesado.jsonl`) y los registros en el Excel consolidado, en
+    el orden del archivo. Devuelve (procesados, errores). Lanza ValueError si
+    alguna de las salidas es el propio archivo de entrada.
+    """
+    from document_utils import write_excel
+
+    jsonl_path = os.path.splitext(output)[0] + ".reprocesado.jsonl"
+    for target in (output, jsonl_path):
+        if os.path.abspath(target) == os.path.abspath(path):
+            raise ValueError(f"La salida {target} sobrescribiría el archivo de entrada")
+    stats = {"processed": 0, "errors": 0}
+
+    def documents(jsonl):
+        for record, error in reprocess_archive(path, workers, chunk_bytes):
+            if error:
+                stats["errors"] += 1
+                print(f"Error: {error}", file=sys.stderr)
+                continue
+            jsonl.write(json.dumps(record.to_dict(), ensure_ascii=False) + "\n")
+            stats["processed"] += 1
+            yield record
+
+    with open(jsonl_path, "w", encoding="utf-8") as jsonl:
+        write_excel(documents(jsonl), output)
+
+    return stats["processed"], stats["errors"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reprocesa resultados de Azure archivados en JSONL.")
+    parser.add_argument("path", help="Archivo JSONL con los resultados de Azure")
+    parser.add_argument("--output", default="Reporte_Reprocesado.xlsx", help="Ruta del reporte Excel")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, uno por núcleo)")
+    parser.add_argument("--chunk-bytes", type=int, default=REPROCESS_CHUNK_BYTES, help="Tamaño de cada tramo")
+    parser.add_argument("--from-jobs", action="store_true",
+                        help="Crea el archivo con los resultados de la cola de trabajos en lugar de reprocesarlo")
+    args = parser.parse_args(argv)
+
+    if args.from_jobs:
+        count = archive_from_jobs(args.path)
+        print(f"Archivados: {count} | Archivo: {args.path}")
+        return 0
+
+    try:
+        processed, errors = run_reprocess(args.path, args.output, args.workers, args.chunk_bytes)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Procesados: {processed} | Errores: {errors} | Reporte: {args.output}")
+    return 1 if errors and not processed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
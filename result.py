@@ -1,5 +1,194 @@
+import base64
+import io
 import streamlit as st
-from document_utils import validate_field_format, update_extraction_value
+from document_utils import sanitize_value, validate_field_format, validate_field, generate_excel
+from spool import load_bytes
+import metrics
+from jobs import job_store
+from dedup import dedup_index
+from search import search_index
+from records import DocumentRecord, summarize
+
+try:
+    import pypdfium2 as pdfium
+    PdfiumError = pdfium.PdfiumError
+except ImportError:
+    pdfium = None
+    PdfiumError = ()
+
+PREVIEW_SCALE = 0.8
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def pdf_iframe_html(handle):
+    """HTML del iframe con el PDF en base64, memorizado por hash del contenido."""
+    base64_pdf = base64.b64encode(load_bytes(handle)).decode('utf-8')
+    return f'<iframe src="data:application/pdf;base64,{base64_pdf}#view=fitH" width="100%" height="500"></iframe>'
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def pdf_page_count(handle):
+    return len(pdfium.PdfDocument(load_bytes(handle)))
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def pdf_page_image(handle, page_index, scale=PREVIEW_SCALE):
+    """Miniatura PNG de una página, memorizada por hash del contenido y página."""
+    page = pdfium.PdfDocument(load_bytes(handle))[page_index]
+    output = io.BytesIO()
+    page.render(scale=scale).to_pil().save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+def display_pdf(handle, key, file_name=None):
+    """
+    Muestra el PDF del spool. Con pypdfium2 instalado se envía solo la página
+    visible como imagen reducida; si no, el PDF completo en un iframe.
+    """
+    try:
+        if pdfium is None:
+            st.markdown(pdf_iframe_html(handle), unsafe_allow_html=True)
+            return
+
+        page_count = pdf_page_count(handle)
+        page = 1
+        if page_count > 1:
+            page = st.number_input(f"Página (de {page_count})", min_value=1, max_value=page_count, key=f"{key}-page")
+        image = pdf_page_image(handle, page - 1)
+    except FileNotFoundError:
+        st.warning("El PDF ya no está disponible para la vista previa.")
+        return
+    except PdfiumError:
+        # PDF dañado o cifrado: no se puede renderizar, pero sí descargar.
+        st.warning("No se pudo generar la vista previa de este PDF (dañado o protegido).")
+        st.download_button("📄 Descargar PDF", data=load_bytes(handle), file_name=file_name or f"{handle[:12]}.pdf",
+                           mime="application/pdf", key=f"{key}-download")
+        return
+    st.image(image, width="stretch")
+
+def reset_state():
+    st.session_state.processed_data = None
+    st.session_state.processing_complete = False
+    st.session_state.job_id = None
+    st.session_state.job_errors = []
+    st.query_params.pop("job", None)
+    bump_data_version()
+
+def load_job_results(job_id, complete=True):
+    """
+    Carga en la sesión los documentos terminados de un trabajo. Los ya cargados
+    se conservan (con sus correcciones) y los nuevos se agregan al final, así
+    los paneles no cambian de índice mientras el trabajo sigue en curso.
+    Devuelve la cantidad de documentos nuevos.
+    """
+    current = st.session_state.get("processed_data") or []
+    new = job_store.load_documents(job_id, skip={doc.get("position") for doc in current})
+    st.session_state.processed_data = current + new
+    st.session_state.job_errors = job_store.load_errors(job_id)
+    st.session_state.processing_complete = complete
+    bump_data_version()
+    return len(new)
+
+def bump_data_version():
+    """Marca que los datos procesados cambiaron (invalida el Excel en caché)."""
+    st.session_state.data_version = st.session_state.get("data_version", 0) + 1
+
+def get_excel_report():
+    """Excel del lote, regenerado solo cuando cambia la versión de los datos."""
+    version = st.session_state.get("data_version", 0)
+    cached = st.session_state.get("excel_cache")
+    if not cached or cached[0] != version:
+        with metrics.timer("export"):
+            cached = (version, generate_excel(st.session_state.processed_data))
+        st.session_state.excel_cache = cached
+    return cached[1]
+
+def get_summary():
+    """
+    Resumen del lote. Se calcula una vez por lista de documentos cargada y
+    luego se mantiene en forma incremental al cambiar el estado de un documento.
+    """
+    data = st.session_state.processed_data
+    if st.session_state.get("summary_source") is not data:
+        st.session_state.summary = summarize(DocumentRecord.from_dict(d) for d in data or [])
+        st.session_state.summary_source = data
+    return st.session_state.summary
+
+def _track_estado(previous, doc):
+    if previous == doc["estado"]:
+        return
+    summary = get_summary()
+    summary["revisar"] += (doc["estado"] == "Revisar") - (previous == "Revisar")
+    # El resumen y el botón de exportación están fuera del fragmento del documento.
+    st.session_state.needs_app_rerun = True
+
+def revalidate_field(doc_index, field_key):
+    """Re-ejecuta la validación de un solo campo del documento."""
+    doc = st.session_state.processed_data[doc_index]
+    previous = doc["estado"]
+    with metrics.timer("revalidate_field", doc["tipo"]):
+        validate_field(doc, field_key)
+    _track_estado(previous, doc)
+
+def filter_documents(documents, estado=None, tipos=None):
+    """Índices de los documentos que cumplen el filtro de estado y de tipo."""
+    return [
+        i for i, d in enumerate(documents)
+        if (not estado or d.get("estado") == estado) and (not tipos or d["tipo"] in tipos)
+    ]
+
+def paginate(indexes, page_size, key="review"):
+    """Selector de página; devuelve solo los índices de la página visible."""
+    pages = max(1, -(-len(indexes) // page_size))
+    page_key = f"{key}-page"
+    page = 1
+    if pages > 1:
+        # Si el filtro redujo la cantidad de páginas, se vuelve a la última disponible.
+        if st.session_state.get(page_key, 1) > pages:
+            st.session_state[page_key] = pages
+        page = st.number_input(f"Página (de {pages})", min_value=1, max_value=pages, key=page_key)
+    start = (page - 1) * page_size
+    return indexes[start:start + page_size]
+
+def persist_document(doc):
+    """Guarda las correcciones en el trabajo y en los índices de duplicados y de búsqueda."""
+    job_store.save_document(doc)
+    dedup_index.update_extraccion(doc)
+    search_index.update_fields(doc)
+
+def field_error(doc, key):
+    """Error vigente del campo; los campos no extraídos se consideran vacíos."""
+    if key in doc["extraccion"]:
+        return doc["validacion"].get(key)
+    return validate_field_format(key, "")
+
+def render_search_results(query):
+    """Resultados de la búsqueda en el índice, con enlace al lote de cada documento."""
+    results = search_index.search(query)
+    if not results:
+        st.caption("Sin resultados.")
+        return
+    for r in results:
+        lote = f" · [Abrir lote](?job={r['job_id']})" if r["job_id"] else ""
+        st.markdown(f"**{r['file_name']}** · {r['tipo']} · {r['estado']}{lote}  \n{r['fragmento']}")
+
+def update_extraction_value(doc_index, field_key):
+    """Callback ejecutado cuando el usuario cambia un input."""
+    widget_key = f"doc{doc_index}-{field_key}"
+    
+    if widget_key in st.session_state:
+        raw_value = st.session_state[widget_key]
+                
+        clean_value = sanitize_value(field_key, raw_value)
+                
+        st.session_state.processed_data[doc_index]['extraccion'].setdefault(field_key, {})['value'] = clean_value
+                
+        if raw_value != clean_value:
+            st.session_state[widget_key] = clean_value
+                    
+        revalidate_field(doc_index, field_key)
+        persist_document(st.session_state.processed_data[doc_index])
+        bump_data_version()
+        if get_summary()["revisar"] == 0:
+            # Con el lote validado, el Excel del botón de descarga debe reflejar la edición.
+            st.session_state.needs_app_rerun = True
+
 
 def render_field(label, key, doc_index, col=None):
     """Renderiza un input field conectado al estado con validación visual."""
@@ -11,9 +200,7 @@ def render_field(label, key, doc_index, col=None):
     if widget_key not in st.session_state:
         st.session_state[widget_key] = initial_val
         
-    current_val_in_state = st.session_state[widget_key] 
-        
-    error = validate_field_format(key, current_val_in_state) 
+    error = field_error(doc, key)
     
     container = col if col else st
     
@@ -107,8 +294,7 @@ def render_contrato_form(index):
                   on_change=update_extraction_value, 
                   args=(index, "objeto_del_contrato_texto"))
     
-    current_val_in_state = st.session_state[widget_key] 
-    error = validate_field_format("objeto_del_contrato_texto", current_val_in_state) 
+    error = field_error(doc, "objeto_del_contrato_texto")
     if error:
         st.caption(f":red[{error}]")
     c6, c7 = st.columns(2)
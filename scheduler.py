@@ -0,0 +1,135 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from config import env
+
+MAX_REQUESTS_PER_SECOND = float(env("MAX_REQUESTS_PER_SECOND", "15"))
+MAX_RETRIES = int(env("MAX_RETRIES", "5"))
+RETRY_BASE_SECONDS = float(env("RETRY_BASE_SECONDS", "1"))
+RETRY_MAX_SECONDS = float(env("RETRY_MAX_SECONDS", "60"))
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def retry_after_seconds(error):
+    """Segundos indicados por Retry-After (o retry-after-ms) en la respuesta, si existen."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    for header in ("retry-after-ms", "x-ms-retry-after-ms"):
+        value = headers.get(header)
+        if value:
+            try:
+                return float(value) / 1000
+            except ValueError:
+                pass
+
+    value = headers.get("Retry-After") or headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def is_retryable(error):
+    """Errores transitorios: throttling (429), errores 5xx y fallas de red."""
+    from azure.core.exceptions import HttpResponseError, ServiceRequestError, ServiceResponseError
+
+    if isinstance(error, (ServiceRequestError, ServiceResponseError)):
+        return True
+    if isinstance(error, HttpResponseError):
+        return error.status_code in RETRYABLE_STATUS
+    return False
+
+
+class RequestScheduler:
+    """
+    Controla el envío de solicitudes a Azure: limita las solicitudes por segundo
+    y los análisis en vuelo, y reintenta errores transitorios con backoff
+    exponencial con jitter, respetando Retry-After. Un 429 pausa a todos los
+    hilos que usan el planificador, no solo al que lo recibió.
+    """
+
+    def __init__(self, requests_per_second=MAX_REQUESTS_PER_SECOND, max_in_flight=4,
+                 max_retries=MAX_RETRIES, base_delay=RETRY_BASE_SECONDS, max_delay=RETRY_MAX_SECONDS):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.in_flight = 0
+        self.retries = 0
+        self.throttled = 0
+        self._slots = threading.BoundedSemaphore(max(1, max_in_flight))
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+        self._paused_until = 0.0
+
+    def _wait_for_turn(self):
+        with self._lock:
+            start = max(time.monotonic(), self._next_start)
+            self._next_start = start + self.interval
+        while True:
+            # Una pausa puede llegar mientras el hilo espera su turno: entonces toma
+            # un turno nuevo después de la pausa, sin salir junto con los demás.
+            with self._lock:
+                if self._paused_until > start:
+                    start = self._next_start
+                    self._next_start = start + self.interval
+            delay = start - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def pause(self, seconds):
+        """Ninguna solicitud nueva comienza antes de `seconds` segundos."""
+        with self._lock:
+            until = time.monotonic() + seconds
+            self._paused_until = max(self._paused_until, until)
+            self._next_start = max(self._next_start, until)
+
+    def backoff_delay(self, error, attempt):
+        """Espera antes del reintento, o None si el error no se debe reintentar."""
+        if attempt >= self.max_retries or not is_retryable(error):
+            return None
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = retry_after_seconds(error)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def run(self, func, *args, **kwargs):
+        """Ejecuta func respetando el presupuesto de solicitudes y reintentando si corresponde."""
+        attempt = 0
+        while True:
+            with self._slots:
+                self._wait_for_turn()
+                with self._lock:
+                    self.in_flight += 1
+                try:
+                    return func(*args, **kwargs)
+                except Exception as e:
+                    delay = self.backoff_delay(e, attempt)
+                    if delay is None:
+                        raise
+                    if getattr(e, "status_code", None) == 429:
+                        with self._lock:
+                            self.throttled += 1
+                        self.pause(delay)
+                finally:
+                    with self._lock:
+                        self.in_flight -= 1
+
+            with self._lock:
+                self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": self.in_flight, "retries": self.retries, "throttled": self.throttled}
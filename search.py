@@ -0,0 +1,156 @@
+"""
+Índice de búsqueda de texto completo sobre los documentos procesados (SQLite FTS5).
+
+Cada documento se indexa con su nombre de archivo, los campos extraídos y el
+`content` de Azure. Los números con separadores ("1.020.345.678", "900.123.456-7")
+se compactan al indexar y al buscar, así se encuentran escritos con o sin puntos.
+Las correcciones de revisión actualizan solo la columna de campos del documento.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from config import env
+
+SEARCH_PATH = env("SEARCH_PATH", os.path.join(".smartdoc_cache", "search.sqlite"))
+SEARCH_LIMIT = 20
+
+NUMBER_SEPARATOR_PATTERN = re.compile(r"(?<=\d)[.\-,](?=\d)")
+TERM_PATTERN = re.compile(r"\w+")
+
+
+def compact_numbers(text):
+    """Quita los separadores entre dígitos: "1.020.345-6" -> "10203456"."""
+    return NUMBER_SEPARATOR_PATTERN.sub("", text)
+
+def fields_text(extraccion):
+    """Texto indexable de los campos extraídos ("campo valor" por línea)."""
+    return "\n".join(
+        f"{key} {compact_numbers(str(data.get('value')))}"
+        for key, data in extraccion.items()
+        if data.get("value") is not None
+    )
+
+def match_query(query):
+    """
+    Consulta FTS5 a partir del texto del usuario: todos los términos deben
+    aparecer y cada uno se busca como prefijo. Devuelve None si no hay términos.
+    """
+    terms = TERM_PATTERN.findall(compact_numbers(query))
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def document_key(doc):
+    """Identidad del documento en el índice: su posición en el trabajo, o el handle."""
+    if "job_id" in doc:
+        return f"{doc['job_id']}:{doc['position']}"
+    return doc["handle"]
+
+
+class SearchIndex:
+    """Índice FTS5 de documentos; las filas de `documents` y `documents_fts` comparten rowid."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                " id INTEGER PRIMARY KEY, doc_key TEXT NOT NULL UNIQUE, job_id TEXT, handle TEXT,"
+                " file_name TEXT NOT NULL, tipo TEXT NOT NULL, estado TEXT, extraccion TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+                " file_name, fields, content, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        return self._conn
+
+    def _row_id(self, conn, doc_key):
+        row = conn.execute("SELECT id FROM documents WHERE doc_key = ?", (doc_key,)).fetchone()
+        return row[0] if row else None
+
+    def index_document(self, doc, content=""):
+        """Agrega o reemplaza el documento con sus campos y el contenido de Azure."""
+        key = document_key(doc)
+        extraccion = json.dumps(doc["extraccion"], ensure_ascii=False)
+        with self._lock:
+            conn = self._connection()
+            row_id = self._row_id(conn, key)
+            if row_id is not None:
+                conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (row_id,))
+                conn.execute(
+                    "UPDATE documents SET handle = ?, file_name = ?, tipo = ?, estado = ?, extraccion = ? WHERE id = ?",
+                    (doc.get("handle"), doc["file_name"], doc["tipo"], doc.get("estado"), extraccion, row_id)
+                )
+            else:
+                row_id = conn.execute(
+                    "INSERT INTO documents (doc_key, job_id, handle, file_name, tipo, estado, extraccion)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, doc.get("job_id"), doc.get("handle"), doc["file_name"], doc["tipo"], doc.get("estado"), extraccion)
+                ).lastrowid
+            conn.execute(
+                "INSERT INTO documents_fts (rowid, file_name, fields, content) VALUES (?, ?, ?, ?)",
+                (row_id, doc["file_name"], fields_text(doc["extraccion"]), compact_numbers(content or ""))
+            )
+            conn.commit()
+
+    def update_fields(self, doc):
+        """Actualiza solo los campos y el estado de un documento ya indexado."""
+        with self._lock:
+            conn = self._connection()
+            row_id = self._row_id(conn, document_key(doc))
+            if row_id is None:
+                return
+            conn.execute(
+                "UPDATE documents SET estado = ?, extraccion = ? WHERE id = ?",
+                (doc.get("estado"), json.dumps(doc["extraccion"], ensure_ascii=False), row_id)
+            )
+            conn.execute("UPDATE documents_fts SET fields = ? WHERE rowid = ?", (fields_text(doc["extraccion"]), row_id))
+            conn.commit()
+
+    def search(self, query, limit=SEARCH_LIMIT, tipo=None):
+        """
+        Documentos que contienen todos los términos, ordenados por relevancia
+        (los campos extraídos pesan más que el contenido).
+        """
+        expression = match_query(query)
+        if expression is None:
+            return []
+
+        sql = (
+            "SELECT d.job_id, d.handle, d.file_name, d.tipo, d.estado, d.extraccion,"
+            " snippet(documents_fts, -1, '**', '**', '…', 12)"
+            " FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+            " WHERE documents_fts MATCH ?"
+        )
+        params = [expression]
+        if tipo:
+            sql += " AND d.tipo = ?"
+            params.append(tipo)
+        sql += " ORDER BY bm25(documents_fts, 2.0, 5.0, 1.0) LIMIT ?"
+        params.append(limit)
+
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        return [
+            {"job_id": job_id, "handle": handle, "file_name": file_name, "tipo": tipo, "estado": estado,
+             "extraccion": json.loads(extraccion), "fragmento": fragment}
+            for job_id, handle, file_name, tipo, estado, extraccion, fragment in rows
+        ]
+
+    def count(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+
+search_index = SearchIndex(SEARCH_PATH)
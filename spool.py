@@ -0,0 +1,79 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from config import env
+
+SPOOL_DIR = env("SPOOL_DIR", os.path.join(tempfile.gettempdir(), "smartdoc_spool"))
+SPOOL_TTL_SECONDS = int(env("SPOOL_TTL_SECONDS", str(24 * 3600)))
+
+
+def _path(handle, suffix):
+    return os.path.join(SPOOL_DIR, handle + suffix)
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def spool_document(document_bytes, azure_json=None):
+    """
+    Guarda el PDF (y opcionalmente el JSON de Azure) en el spool en disco y
+    devuelve un handle liviano (SHA-256 del PDF) para guardar en la sesión.
+    """
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    handle = hashlib.sha256(document_bytes).hexdigest()
+
+    pdf_path = _path(handle, ".pdf")
+    if os.path.exists(pdf_path):
+        os.utime(pdf_path)
+    else:
+        _write_atomic(pdf_path, document_bytes)
+
+    json_path = _path(handle, ".json.gz")
+    if os.path.exists(json_path):
+        os.utime(json_path)
+    elif azure_json is not None:
+        payload = json.dumps(azure_json, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        _write_atomic(json_path, gzip.compress(payload, compresslevel=5))
+
+    return handle
+
+def load_bytes(handle):
+    """Lee el PDF del spool solo cuando se necesita (p. ej. la vista previa)."""
+    with open(_path(handle, ".pdf"), "rb") as f:
+        return f.read()
+
+def load_json(handle):
+    """Lee el JSON de Azure del spool, o None si no se guardó."""
+    try:
+        with gzip.open(_path(handle, ".json.gz"), "rb") as f:
+            return json.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+def purge_spool(max_age_seconds=SPOOL_TTL_SECONDS, keep=()):
+    """
+    Elimina del spool los archivos no usados en max_age_seconds, salvo los de
+    los handles en `keep` (p. ej. los que siguen referenciados por un trabajo).
+    """
+    if not os.path.isdir(SPOOL_DIR):
+        return 0
+
+    limit = time.time() - max_age_seconds
+    removed = 0
+    with os.scandir(SPOOL_DIR) as entries:
+        for entry in entries:
+            if entry.name.split(".", 1)[0] in keep:
+                continue
+            try:
+                if entry.is_file() and entry.stat().st_mtime < limit:
+                    os.remove(entry.path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+    return removed